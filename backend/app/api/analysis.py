@@ -1,27 +1,37 @@
 from datetime import datetime
-from uuid import uuid4
-
-from fastapi import Depends, APIRouter, Request, HTTPException
-from sqlalchemy import desc
-from sqlalchemy.orm import Session
-
-from app.database import SessionLocal
-from app.db_models import DiaryEntry, User, WritingExerciseEntry
-from app.model import predict_emotions
-from app.schemas import WritingExerciseCreate, WritingExerciseEntrySchema
-from typing import List
+from uuid import UUID, uuid4
+
+from fastapi import Depends, APIRouter, Query, Request, Response, HTTPException
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import rollups
+from app.catalog import catalog
+from app.core import config
+from app.core.executor import BULK, INTERACTIVE, run_in_executor
+from app.database import get_async_db
+from app.db_models import Analysis, User, WritingExerciseEntry
+from app.metrics import ANALYSES, STAGE_SECONDS
+from app.model import Prediction, pack_scores, predict, predict_batch, prediction_cache
+from app.pagination import fetch_page, keyset, page_limit, stream_rows
+from app.responses import FastJSONResponse, analysis_response, batch_analysis_response
+from app.schemas import (
+    AnalyzeResponse,
+    BatchAnalyzeRequest,
+    BatchAnalyzeResponse,
+    CacheStatsOut,
+    CatalogRefreshOut,
+    DiaryPage,
+    LANGUAGES,
+    WritingExerciseCreate,
+    WritingExerciseCreated,
+    WritingExerciseEntrySchema,
+)
+from typing import List, Literal, Optional
 
 router = APIRouter()
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 from uuid import uuid4
 from datetime import datetime
 from fastapi import APIRouter, Request, Depends
@@ -29,54 +39,171 @@ from sqlalchemy.orm import Session
 
 router = APIRouter()
 
-@router.post("/analyze")
-async def analyze_text(
-        request: Request,
-        db: Session = Depends(get_db),
-):
+@router.post("/analyze", response_model=AnalyzeResponse)
+async def analyze_text(request: Request, db: AsyncSession = Depends(get_async_db)):
     body = await request.json()
     text = body.get("text")
     language = body.get("language", "uk")
-    user_id = body.get("user_id")
+    user_id = _parse_user_id(body.get("user_id"))
 
     if not text:
-        return {"error": "Text is required."}
-    result = predict_emotions(text, db, language)
+        return FastJSONResponse({"error": "Text is required."})
+    if language not in LANGUAGES:
+        raise HTTPException(status_code=400, detail=f"Unsupported language, expected one of {list(LANGUAGES)}.")
+
+    ANALYSES.inc(language)
+    # Only the model runs on the analyze executor; the database work stays on
+    # the event loop and never holds a worker thread.
+    with STAGE_SECONDS.time("catalog"):
+        entries = await catalog.entries_async(db)
+    lane = BULK if request.headers.get("X-Priority") == BULK else INTERACTIVE
+    prediction = await run_in_executor(predict, text, entries, language, lane=lane)
 
     if user_id:
-        user = db.query(User).filter(User.id == user_id).first()
-        if user:
-            for emotion_data in result:
-                entry = DiaryEntry(
-                    id=str(uuid4()),
-                    text=text,
-                    emotion=emotion_data["emotion"],
-                    date=datetime.now(),
-                    user_id=user_id
-                )
-                db.add(entry)
-            db.commit()
-
-    return {"emotions": result}
-
-@router.get("/diary/{user_id}")
-def get_diary_entries(user_id: str, db: Session = Depends(get_db)):
-    diary_entries = db.query(DiaryEntry).filter(DiaryEntry.user_id == user_id).all()
-
-    result = []
-    for entry in diary_entries:
-        result.append({
-            "date": entry.date.strftime("%Y-%m-%d %H:%M:%S"),
-            "emotion": entry.emotion,
-            "text": entry.text
-        })
-
-    return {"entries": result}
-
-@router.post("/diary/write_exercise")
+        with STAGE_SECONDS.time("insert"):
+            if await db.get(User, user_id):
+                row = _analysis_row(user_id, text, language, prediction, datetime.now())
+                db.add(Analysis(**row))
+                await rollups.increment(db, user_id, [(row["date"], row["top_emotions"])])
+                await db.commit()
+
+    with STAGE_SECONDS.time("serialize"):
+        return analysis_response(prediction.recommendations)
+
+
+def _parse_user_id(user_id):
+    if user_id is None or isinstance(user_id, UUID):
+        return user_id
+    try:
+        return UUID(str(user_id))
+    except ValueError:
+        return None
+
+
+def _analysis_row(user_id, text: str, language: str, prediction: Prediction, date: datetime) -> dict:
+    return {
+        "id": uuid4(),
+        "user_id": user_id,
+        "text": text,
+        "language": language,
+        "scores": pack_scores(prediction.scores),
+        "top_emotions": prediction.top_emotions,
+        "date": date,
+    }
+
+
+@router.post("/analyze/batch", response_model=BatchAnalyzeResponse)
+async def analyze_batch(request: BatchAnalyzeRequest, db: AsyncSession = Depends(get_async_db)):
+    if not request.texts or not all(request.texts):
+        raise HTTPException(status_code=400, detail="Every text must be non-empty.")
+    if len(request.texts) > config.ANALYZE_BATCH_MAX_TEXTS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {config.ANALYZE_BATCH_MAX_TEXTS} texts per batch."
+        )
+
+    ANALYSES.inc(request.language, amount=len(request.texts))
+    with STAGE_SECONDS.time("catalog"):
+        entries = await catalog.entries_async(db)
+    predictions = await run_in_executor(predict_batch, request.texts, entries, request.language, lane=BULK)
+
+    if request.user_id:
+        with STAGE_SECONDS.time("insert"):
+            if await db.get(User, request.user_id):
+                now = datetime.now()
+                rows = [
+                    _analysis_row(request.user_id, text, request.language, prediction, now)
+                    for text, prediction in zip(request.texts, predictions)
+                ]
+                await db.execute(insert(Analysis), rows)
+                await rollups.increment(db, request.user_id, [(row["date"], row["top_emotions"]) for row in rows])
+                await db.commit()
+
+    with STAGE_SECONDS.time("serialize"):
+        return batch_analysis_response([prediction.recommendations for prediction in predictions])
+
+
+@router.post("/catalog/refresh", response_model=CatalogRefreshOut)
+async def refresh_catalog(db: AsyncSession = Depends(get_async_db)):
+    entries = await catalog.refresh_async(db, force=True)
+    return {"message": "Catalog refreshed", "entries": len(entries)}
+
+
+@router.get("/cache/stats", response_model=CacheStatsOut)
+def prediction_cache_stats():
+    return prediction_cache.stats()
+
+
+def _diary_entries_out(analysis, catalog_entries) -> List[dict]:
+    # Clients still expect one diary item per detected emotion, and, as when
+    # diary_entries rows were written per recommendation, only for emotions
+    # the catalog has recommendations for in the analysis language. Analyses
+    # backfilled from diary_entries have no language and were filtered then.
+    date = analysis.date.strftime("%Y-%m-%d %H:%M:%S")
+    return [
+        {
+            "date": date,
+            "emotion": emotion,
+            "text": analysis.text
+        }
+        for emotion in analysis.top_emotions
+        if analysis.language is None or (emotion, analysis.language) in catalog_entries
+    ]
+
+
+def _writing_entry_out(entry) -> dict:
+    return {
+        "id": str(entry.id),
+        "text": entry.text,
+        "date": entry.date.isoformat(),
+        "user_id": str(entry.user_id)
+    }
+
+
+def diary_entries_query(user_id, cursor: Optional[str] = None):
+    query = select(Analysis.id, Analysis.date, Analysis.top_emotions, Analysis.text, Analysis.language)
+    query = query.where(Analysis.user_id == user_id)
+    return keyset(query, Analysis.date, Analysis.id, cursor, id_type=UUID)
+
+
+def writing_entries_query(user_id, cursor: Optional[str] = None):
+    query = select(
+        WritingExerciseEntry.id,
+        WritingExerciseEntry.text,
+        WritingExerciseEntry.date,
+        WritingExerciseEntry.user_id
+    ).where(WritingExerciseEntry.user_id == user_id)
+    return keyset(query, WritingExerciseEntry.date, WritingExerciseEntry.id, cursor, id_type=UUID)
+
+
+@router.get("/diary/{user_id}", response_model=DiaryPage)
+async def get_diary_entries(
+        user_id: UUID,
+        limit: Optional[int] = Query(
+            None, ge=1, le=config.MAX_PAGE_SIZE,
+            description=(
+                "Number of analyses per page; each analysis yields up to three diary entries. "
+                "Without limit and cursor the whole diary is returned."
+            ),
+        ),
+        cursor: Optional[str] = None,
+        stream: Optional[Literal["ndjson", "json"]] = None,
+        db: AsyncSession = Depends(get_async_db),
+):
+    catalog_entries = await catalog.entries_async(db)
+    query = diary_entries_query(user_id, cursor)
+    if stream:
+        return stream_rows(query, lambda analysis: _diary_entries_out(analysis, catalog_entries), stream)
+
+    analyses, next_cursor = await fetch_page(db, query, page_limit(limit, cursor))
+    result = [entry for analysis in analyses for entry in _diary_entries_out(analysis, catalog_entries)]
+
+    return {"entries": result, "next_cursor": next_cursor}
+
+@router.post("/diary/write_exercise", response_model=WritingExerciseCreated)
 async def create_writing_exercise(
         entry: WritingExerciseCreate,
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
     new_entry = WritingExerciseEntry(
         id=uuid4(),
@@ -85,8 +212,8 @@ async def create_writing_exercise(
         user_id=entry.user_id
     )
     db.add(new_entry)
-    db.commit()
-    db.refresh(new_entry)
+    await db.commit()
+    await db.refresh(new_entry)
     return {"message": "Entry created successfully", "entry": new_entry}
 
 
@@ -94,14 +221,24 @@ async def create_writing_exercise(
     "/diary/write_exercises/{user_id}",
     response_model=List[WritingExerciseEntrySchema]
 )
-def get_writing_exercises(
-        user_id: str,
-        db: Session = Depends(get_db),
+async def get_writing_exercises(
+        user_id: UUID,
+        response: Response,
+        limit: Optional[int] = Query(
+            None, ge=1, le=config.MAX_PAGE_SIZE,
+            description="Entries per page; without limit and cursor every entry is returned.",
+        ),
+        cursor: Optional[str] = None,
+        stream: Optional[Literal["ndjson", "json"]] = None,
+        db: AsyncSession = Depends(get_async_db),
 ):
-    entries = (
-        db.query(WritingExerciseEntry)
-        .filter(WritingExerciseEntry.user_id == user_id)
-        .order_by(desc(WritingExerciseEntry.date))
-        .all()
-    )
-    return entries
\ No newline at end of file
+    query = writing_entries_query(user_id, cursor)
+    if stream:
+        return stream_rows(query, lambda entry: [_writing_entry_out(entry)], stream)
+
+    # The body stays a plain list for existing clients; the cursor for the
+    # next page travels in a header.
+    entries, next_cursor = await fetch_page(db, query, page_limit(limit, cursor))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return entries
@@ -0,0 +1,79 @@
+from collections import Counter
+from datetime import date, timedelta
+from typing import Literal, Optional
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import config
+from app.database import get_async_db
+from app.db_models import MoodRollup
+from app.rollups import PERIOD_DAYS, period_start
+from app.schemas import MoodAnalytics
+
+router = APIRouter()
+
+
+def _period_count(period: str, start: date, end: date) -> int:
+    return (end - period_start(period, start)).days // PERIOD_DAYS[period] + 1
+
+
+def _period_starts(period: str, start: date, end: date) -> list:
+    first = period_start(period, start)
+    return [first + timedelta(days=i * PERIOD_DAYS[period]) for i in range(_period_count(period, start, end))]
+
+
+def mood_rollups_query(user_id, period: str, first: date, last: date):
+    return select(MoodRollup.period_start, MoodRollup.emotion, MoodRollup.count).where(
+        MoodRollup.user_id == user_id,
+        MoodRollup.period == period,
+        MoodRollup.period_start >= first,
+        MoodRollup.period_start <= last,
+    )
+
+
+@router.get("/analytics/{user_id}", response_model=MoodAnalytics)
+async def get_mood_analytics(
+        user_id: UUID,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        period: Literal["day", "week"] = "day",
+        db: AsyncSession = Depends(get_async_db),
+):
+    """Emotion histogram and per-period trend for ``start``..``end`` (inclusive).
+
+    Reads only the precomputed rollups, so the cost depends on the number of
+    periods in the range, not on how many entries the user has written. Week
+    periods start on Monday and are counted whole.
+    """
+    end = end or date.today()
+    start = start or end - timedelta(days=config.ANALYTICS_DEFAULT_DAYS - 1)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    if _period_count(period, start, end) > config.ANALYTICS_MAX_PERIODS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {config.ANALYTICS_MAX_PERIODS} periods per request; use period=week for long ranges."
+        )
+    starts = _period_starts(period, start, end)
+
+    rows = await db.execute(mood_rollups_query(user_id, period, starts[0], starts[-1]))
+
+    histogram = Counter()
+    trend = {day: {} for day in starts}
+    for day, emotion, count in rows:
+        histogram[emotion] += count
+        trend[day][emotion] = count
+
+    return {
+        "period": period,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "histogram": dict(histogram.most_common()),
+        "trend": [
+            {"period_start": day.isoformat(), "total": sum(emotions.values()), "emotions": emotions}
+            for day, emotions in trend.items()
+        ],
+    }
@@ -1,9 +1,6 @@
-import uuid
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.core.security import get_password_hash
-from app.database import SessionLocal
-from app.db_models import User
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
 from app.schemas import (
     UserCreate,
     UserOut,
@@ -11,10 +8,15 @@ from app.schemas import (
     PasswordResetRequest,
     PasswordResetConfirm,
     ChangePassword,
-    ChangeName
+    ChangeName,
+    EmailCheckOut,
+    MessageOut,
+    UserRegistered,
+    UserSummary,
 )
 from app.crud import users as crud_users
 from app.core import security
+from app import mailer
 from pydantic import BaseModel
 from app.utils import send_reset_email
 
@@ -27,23 +29,15 @@ class GoogleLogin(BaseModel):
 router = APIRouter()
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
-@router.post("/register")
-def register_user(user_create: UserCreate, db: Session = Depends(get_db)):
-    db_user = crud_users.get_user_by_email(db, email=user_create.email)
+@router.post("/register", response_model=UserRegistered)
+async def register_user(user_create: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    db_user = await crud_users.get_user_by_email(db, email=user_create.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    hashed_password = security.hash_password(user_create.password)
+    hashed_password = await security.run_hasher(security.hash_password, user_create.password)
 
-    user = crud_users.create_user(
+    user = await crud_users.create_user(
         db=db,
         email=user_create.email,
         password_hash=hashed_password,
@@ -59,9 +53,9 @@ def register_user(user_create: UserCreate, db: Session = Depends(get_db)):
     }
 
 
-@router.get("/check-email")
-def check_email(email: str, db: Session = Depends(get_db)):
-    existing_user = crud_users.get_user_by_email(db, email=email)
+@router.get("/check-email", response_model=EmailCheckOut, response_model_exclude_none=True)
+async def check_email(email: str, db: AsyncSession = Depends(get_async_db)):
+    existing_user = await crud_users.get_user_by_email(db, email=email)
     if existing_user:
         return {
             "exists": True,
@@ -70,14 +64,20 @@ def check_email(email: str, db: Session = Depends(get_db)):
     return {"exists": False}
 
 
-@router.post("/login")
-def login_user(user_login: UserLogin, db: Session = Depends(get_db)):
-    db_user = crud_users.get_user_by_email(db, email=user_login.email)
-    if not db_user:
+@router.post("/login", response_model=UserSummary)
+async def login_user(user_login: UserLogin, db: AsyncSession = Depends(get_async_db)):
+    db_user = await crud_users.get_user_by_email(db, email=user_login.email)
+    # Accounts created through Google sign-in have no password to check.
+    if not db_user or not db_user.password_hash:
         raise HTTPException(status_code=400, detail="Invalid email or password")
 
-    if not security.verify_password(user_login.password, db_user.password_hash):
+    valid, new_hash = await security.run_hasher(
+        security.verify_and_update, user_login.password, db_user.password_hash
+    )
+    if not valid:
         raise HTTPException(status_code=400, detail="Invalid email or password")
+    if new_hash:
+        await crud_users.update_user_password(db, db_user.id, new_hash)
 
     return {
         "id": str(db_user.id),
@@ -86,11 +86,11 @@ def login_user(user_login: UserLogin, db: Session = Depends(get_db)):
     }
 
 
-@router.post("/google-login")
-def google_login(user_data: GoogleLogin, db: Session = Depends(get_db)):
-    user = crud_users.get_user_by_email(db, user_data.email)
+@router.post("/google-login", response_model=UserSummary)
+async def google_login(user_data: GoogleLogin, db: AsyncSession = Depends(get_async_db)):
+    user = await crud_users.get_user_by_email(db, user_data.email)
     if not user:
-        user = crud_users.create_user(
+        user = await crud_users.create_user(
             db=db,
             email=user_data.email,
             name=user_data.name,
@@ -103,55 +103,56 @@ def google_login(user_data: GoogleLogin, db: Session = Depends(get_db)):
     }
 
 
-@router.post("/forgot-password")
-def forgot_password(request: PasswordResetRequest, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == request.email).first()
+@router.post("/forgot-password", response_model=MessageOut)
+async def forgot_password(request: PasswordResetRequest, db: AsyncSession = Depends(get_async_db)):
+    user = await crud_users.get_user_by_email(db, request.email)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    reset_token = str(uuid.uuid4())
-    user.reset_token = reset_token
-    db.commit()
-    send_reset_email(user.email, reset_token)
+    reset_token = security.create_reset_token(user.id, user.password_hash)
+    send_reset_email(db, user.email, reset_token)
+    await db.commit()
+    mailer.dispatcher.wake()
 
     return {"message": "Password reset link has been sent to your email"}
 
 
-@router.post("/reset-password")
-def reset_password(request: PasswordResetConfirm, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.reset_token == request.token).first()
-    if not user:
+@router.post("/reset-password", response_model=MessageOut)
+async def reset_password(request: PasswordResetConfirm, db: AsyncSession = Depends(get_async_db)):
+    user_id = security.reset_token_user_id(request.token)
+    user = await crud_users.get_user_by_id(db, user_id) if user_id else None
+    if not user or not security.verify_reset_token(request.token, user.id, user.password_hash):
         raise HTTPException(status_code=404, detail="Invalid token")
 
-    hashed_password = get_password_hash(request.new_password)
+    hashed_password = await security.run_hasher(security.hash_password, request.new_password)
     user.password_hash = hashed_password
-    user.reset_token = None
-    db.commit()
+    await db.commit()
 
     return {"message": "Password has been successfully reset"}
 
 
-@router.put("/update-password")
-def change_password(data: ChangePassword, db: Session = Depends(get_db)):
-    user = crud_users.get_user_by_email(db, data.email)
+@router.put("/update-password", response_model=MessageOut)
+async def change_password(data: ChangePassword, db: AsyncSession = Depends(get_async_db)):
+    user = await crud_users.get_user_by_email(db, data.email)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    if not security.verify_password(data.old_password, user.password_hash):
+    if not user.password_hash or not await security.run_hasher(
+            security.verify_password, data.old_password, user.password_hash):
         raise HTTPException(status_code=403, detail="Old password is incorrect")
 
-    new_hashed_password = security.hash_password(data.new_password)
-    crud_users.update_user_password(db, user.id, new_hashed_password)
+    new_hashed_password = await security.run_hasher(security.hash_password, data.new_password)
+    await crud_users.update_user_password(db, user.id, new_hashed_password)
 
     return {"message": "Password updated successfully"}
 
 
-@router.put("/update-name")
-def change_name(data: ChangeName, db: Session = Depends(get_db)):
-    user = crud_users.get_user_by_email(db, data.email)
+@router.put("/update-name", response_model=MessageOut)
+async def change_name(data: ChangeName, db: AsyncSession = Depends(get_async_db)):
+    user = await crud_users.get_user_by_email(db, data.email)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    crud_users.update_user_name(db, user.id, data.new_name)
+    await crud_users.update_user_name(db, user.id, data.new_name)
 
     return {"message": "Name updated successfully"}
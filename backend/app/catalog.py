@@ -0,0 +1,115 @@
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
+
+from app.core import config
+from app.db_models import Tip, BreathingExercise, Emotion
+from app.responses import EncodedList
+
+CatalogKey = Tuple[str, str]
+
+
+def _tip_payload(tip: Tip) -> dict:
+    return {
+        "id": str(tip.id),
+        "title": tip.title,
+        "description": tip.description,
+        "type": tip.type.value
+    }
+
+
+def _breathing_payload(exercise: BreathingExercise) -> dict:
+    return {
+        "id": str(exercise.id),
+        "title": exercise.title,
+        "description": exercise.description,
+        "inhale_duration": exercise.inhale_duration,
+        "hold_duration": exercise.hold_duration,
+        "exhale_duration": exercise.exhale_duration,
+        "cycles": exercise.cycles,
+        "type": "breathing_exercise"  # <-- type is defined here for the card to understand
+    }
+
+
+def catalog_version_query():
+    """Row counts and latest updates of the catalog tables, as one row."""
+    columns = []
+    for model in (Emotion, Tip, BreathingExercise):
+        columns.append(select(func.count(model.id)).scalar_subquery())
+        columns.append(select(func.max(model.updated_at)).scalar_subquery())
+    return select(*columns)
+
+
+class RecommendationCatalog:
+    """Process-local copy of the tips and breathing exercises shown after an analysis.
+
+    Entries are keyed by (emotion name, language) and hold the ready-to-serve
+    payload list: the tips for that emotion, or its breathing exercises when it
+    has no tips. The content is seeded and rarely edited, so it is loaded once
+    and then only re-read on a forced refresh (POST /api/catalog/refresh) or,
+    at most every ``refresh_seconds``, when a cheap version query shows the
+    tables changed. Refreshes are serialized on an asyncio lock, so the catalog
+    belongs to the event loop of the worker that created it.
+    """
+
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self._entries: Dict[CatalogKey, List[dict]] = {}
+        self._version: Optional[tuple] = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    @property
+    def version(self) -> Optional[tuple]:
+        return self._version
+
+    def _is_stale(self) -> bool:
+        return self._version is None or time.monotonic() - self._checked_at >= self.refresh_seconds
+
+    async def entries_async(self, db: AsyncSession) -> Dict[CatalogKey, List[dict]]:
+        if self._is_stale():
+            await self.refresh_async(db)
+        return self._entries
+
+    async def refresh_async(self, db: AsyncSession, force: bool = False):
+        # Requests that find the catalog stale while a refresh is running wait
+        # for it and then reuse its result instead of querying again.
+        async with self._lock:
+            if not force and not self._is_stale():
+                return self._entries
+            return await db.run_sync(self._refresh, force)
+
+    def _refresh(self, db: Session, force: bool = False):
+        version = self._read_version(db)
+        self._checked_at = time.monotonic()
+        if force or version != self._version:
+            # Swap in a complete new mapping so concurrent readers never see a
+            # half-built catalog.
+            self._entries = self._load(db)
+            self._version = version
+        return self._entries
+
+    @staticmethod
+    def _read_version(db: Session) -> tuple:
+        return tuple(db.execute(catalog_version_query()).one())
+
+    @staticmethod
+    def _load(db: Session) -> Dict[CatalogKey, List[dict]]:
+        tips: Dict[CatalogKey, List[dict]] = {}
+        breathing: Dict[CatalogKey, List[dict]] = {}
+        for tip in db.query(Tip).options(joinedload(Tip.emotion)).all():
+            tips.setdefault((tip.emotion.name, tip.language), []).append(_tip_payload(tip))
+        for exercise in db.query(BreathingExercise).options(joinedload(BreathingExercise.emotion)).all():
+            breathing.setdefault((exercise.emotion.name, exercise.language), []).append(_breathing_payload(exercise))
+
+        entries = dict(breathing)
+        entries.update(tips)
+        # Encode each payload list once; /api/analyze splices the bytes in.
+        return {key: EncodedList(payloads) for key, payloads in entries.items()}
+
+
+catalog = RecommendationCatalog(config.CATALOG_REFRESH_SECONDS)
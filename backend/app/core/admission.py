@@ -0,0 +1,116 @@
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Dict, NamedTuple, Optional, Sequence
+
+from app.metrics import ADMISSION_SHED, ADMISSION_WAIT_SECONDS
+
+# Weight of the newest sample in the service-time moving average.
+EWMA_ALPHA = 0.2
+
+
+class Overloaded(Exception):
+    """Raised when an analysis is shed instead of queued."""
+
+    def __init__(self, lane: str, retry_after: int = 1):
+        super().__init__("The analysis service is overloaded, try again shortly.")
+        self.lane = lane
+        self.retry_after = retry_after
+
+
+class Lane(NamedTuple):
+    name: str
+    max_queue: int
+    deadline: float
+
+
+class AdmissionController:
+    """Bounds in-flight work to ``limit`` slots with prioritised waiting lanes.
+
+    Lanes are listed highest priority first; a freed slot always goes to the
+    oldest waiter of the highest non-empty lane. A request is shed with
+    Overloaded when its lane is full, when the estimated wait (requests ahead
+    of it times the moving average service time, spread over the slots)
+    exceeds the lane deadline, or when it has waited that long anyway.
+    A free slot is always taken immediately, so a stale estimate can never
+    shed an idle service. Runs on the event loop only, so it needs no locks.
+    """
+
+    def __init__(self, limit: int, lanes: Sequence[Lane]):
+        self.limit = limit
+        self.lanes: Dict[str, Lane] = {lane.name: lane for lane in lanes}
+        self.in_flight = 0
+        self.service_seconds: Optional[float] = None
+        self._queues: Dict[str, deque] = {lane.name: deque() for lane in lanes}
+
+    def estimated_wait(self, lane: str) -> float:
+        if self.service_seconds is None:
+            return 0.0
+        ahead = 0
+        for name in self.lanes:
+            ahead += len(self._queues[name])
+            if name == lane:
+                break
+        return (ahead + 1) * self.service_seconds / self.limit
+
+    def _shed(self, lane: str, reason: str, wait: float):
+        ADMISSION_SHED.inc(lane, reason)
+        raise Overloaded(lane, retry_after=max(1, math.ceil(wait)))
+
+    async def acquire(self, lane: str):
+        if self.in_flight < self.limit and not any(self._queues.values()):
+            self.in_flight += 1
+            ADMISSION_WAIT_SECONDS.observe(0.0, lane)
+            return
+
+        settings = self.lanes[lane]
+        queue = self._queues[lane]
+        wait = self.estimated_wait(lane)
+        if len(queue) >= settings.max_queue:
+            self._shed(lane, "queue_full", wait)
+        if wait > settings.deadline:
+            self._shed(lane, "deadline", wait)
+
+        started = time.perf_counter()
+        future = asyncio.get_running_loop().create_future()
+        queue.append(future)
+        try:
+            await asyncio.wait_for(future, settings.deadline)
+        except asyncio.TimeoutError:
+            if future in queue:
+                queue.remove(future)
+            self._shed(lane, "timeout", self.estimated_wait(lane))
+        except BaseException:
+            # Cancelled (e.g. the client went away) just as a slot was handed
+            # over: pass the slot on instead of leaking it.
+            if future.done() and not future.cancelled():
+                self._hand_over()
+            elif future in queue:
+                queue.remove(future)
+            raise
+        ADMISSION_WAIT_SECONDS.observe(time.perf_counter() - started, lane)
+
+    def release(self, service_seconds: float):
+        if self.service_seconds is None:
+            self.service_seconds = service_seconds
+        else:
+            self.service_seconds += EWMA_ALPHA * (service_seconds - self.service_seconds)
+        self._hand_over()
+
+    def _hand_over(self):
+        for queue in self._queues.values():
+            while queue:
+                future = queue.popleft()
+                if not future.done():
+                    future.set_result(None)
+                    return
+        self.in_flight -= 1
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "service_seconds": self.service_seconds,
+            **{f"queued_{name}": len(queue) for name, queue in self._queues.items()},
+        }
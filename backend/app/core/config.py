@@ -0,0 +1,158 @@
+from dotenv import load_dotenv
+import os
+
+load_dotenv()
+
+MODEL_NAME = os.getenv("MODEL_NAME", "./model")
+
+# Micro-batching: concurrent /api/analyze calls are grouped into one forward
+# pass of at most BATCH_MAX_SIZE texts, waiting no longer than BATCH_MAX_WAIT_MS
+# for the batch to fill up.
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "16"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "10"))
+
+# /api/analyze runs inference and its DB writes on a dedicated thread pool so
+# the event loop stays free for cheap routes. ANALYZE_MAX_CONCURRENCY caps how
+# many analyses may be in flight at once; TORCH_NUM_THREADS (0 = torch default)
+# sizes the intra-op pool used by each forward pass.
+ANALYZE_WORKERS = int(os.getenv("ANALYZE_WORKERS", str(min(32, (os.cpu_count() or 1) * 2))))
+ANALYZE_MAX_CONCURRENCY = int(os.getenv("ANALYZE_MAX_CONCURRENCY", str(ANALYZE_WORKERS)))
+TORCH_NUM_THREADS = int(os.getenv("TORCH_NUM_THREADS", "0"))
+TORCH_NUM_INTEROP_THREADS = int(os.getenv("TORCH_NUM_INTEROP_THREADS", "1"))
+
+# Analyses beyond ANALYZE_MAX_CONCURRENCY wait in a priority lane: "interactive"
+# (/api/analyze) is always served before "bulk" (/api/analyze/batch, or
+# /api/analyze with "X-Priority: bulk"). A request is rejected with 503 and
+# Retry-After when its lane already holds ANALYZE_QUEUE_* waiters or its
+# estimated wait, from a moving average of recent analysis times, exceeds
+# ANALYZE_DEADLINE_* seconds.
+ANALYZE_QUEUE_INTERACTIVE = int(os.getenv("ANALYZE_QUEUE_INTERACTIVE", str(ANALYZE_MAX_CONCURRENCY * 4)))
+ANALYZE_QUEUE_BULK = int(os.getenv("ANALYZE_QUEUE_BULK", str(ANALYZE_MAX_CONCURRENCY * 2)))
+ANALYZE_DEADLINE_INTERACTIVE = float(os.getenv("ANALYZE_DEADLINE_INTERACTIVE", "5"))
+ANALYZE_DEADLINE_BULK = float(os.getenv("ANALYZE_DEADLINE_BULK", "30"))
+
+# Inference backend: "torch" (eager PyTorch) or "onnx" (ONNX Runtime on CPU).
+# Exported/compiled artifacts are cached under MODEL_CACHE_DIR and reused
+# across restarts.
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch")
+MODEL_CACHE_DIR = os.getenv("MODEL_CACHE_DIR", os.path.join(MODEL_NAME, ".cache"))
+ONNX_CACHE_DIR = os.getenv("ONNX_CACHE_DIR", os.path.join(MODEL_CACHE_DIR, "onnx"))
+ONNX_TOLERANCE = float(os.getenv("ONNX_TOLERANCE", "1e-4"))
+
+# Weight precision for the PyTorch backend: "fp32", "int8" (dynamically
+# quantized Linear layers) or "bf16". Check the accuracy impact with
+# `python -m scripts.compare_precision` before switching.
+MODEL_PRECISION = os.getenv("MODEL_PRECISION", "fp32")
+
+# Optional compiled forward pass for the PyTorch backend: "off" (eager),
+# "trace" (TorchScript, cached under MODEL_CACHE_DIR/torchscript) or "compile"
+# (torch.compile, inductor cache under MODEL_CACHE_DIR/inductor). Compiled
+# modes pad every batch to its sequence-length bucket (32/64/128/256/512
+# tokens) so only those shapes are ever run, and warm each bucket at startup.
+TORCH_COMPILE = os.getenv("TORCH_COMPILE", "off")
+TORCH_COMPILE_TOLERANCE = float(os.getenv("TORCH_COMPILE_TOLERANCE", "1e-4"))
+
+# The model loads on a background thread at startup (MODEL_EAGER_LOAD=0 defers
+# it to the first analysis). Requests wait up to MODEL_READY_TIMEOUT seconds
+# for it before failing with 503.
+MODEL_EAGER_LOAD = os.getenv("MODEL_EAGER_LOAD", "1") == "1"
+MODEL_READY_TIMEOUT = float(os.getenv("MODEL_READY_TIMEOUT", "30"))
+
+# With MODEL_SERVER_SOCKET set, API workers load no model at all and score on
+# a shared `python -m app.inference.server` listening on that Unix socket, so
+# a node holds one copy of the weights and one torch thread pool however many
+# workers it runs.
+MODEL_SERVER_SOCKET = os.getenv("MODEL_SERVER_SOCKET", "")
+MODEL_SERVER_TIMEOUT = float(os.getenv("MODEL_SERVER_TIMEOUT", str(MODEL_READY_TIMEOUT + 30)))
+
+# Tips and breathing exercises are served from an in-memory catalog. It checks
+# a cheap version query at most every CATALOG_REFRESH_SECONDS and reloads when
+# the content changed; POST /api/catalog/refresh forces a reload.
+CATALOG_REFRESH_SECONDS = float(os.getenv("CATALOG_REFRESH_SECONDS", "300"))
+
+# Score vectors are cached per normalized text and model version in a bounded
+# LRU (PREDICTION_CACHE_SIZE entries, 0 disables it) with a TTL. Set
+# PREDICTION_CACHE_DIR to share entries between workers on the same node; that
+# directory is kept to about PREDICTION_CACHE_DIR_MAX_ENTRIES files.
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "10000"))
+PREDICTION_CACHE_TTL = float(os.getenv("PREDICTION_CACHE_TTL", "3600"))
+PREDICTION_CACHE_DIR = os.getenv("PREDICTION_CACHE_DIR", "")
+PREDICTION_CACHE_DIR_MAX_ENTRIES = int(
+    os.getenv("PREDICTION_CACHE_DIR_MAX_ENTRIES", str(PREDICTION_CACHE_SIZE * 5))
+)
+
+# Texts longer than the model's maximum length (512 tokens): "truncate" scores
+# only their leading tokens; "window" scores overlapping windows that share
+# WINDOW_STRIDE tokens, at most LONG_TEXT_MAX_WINDOWS per text, and combines
+# the window probabilities with WINDOW_AGGREGATION ("mean" or "max").
+LONG_TEXT_MODE = os.getenv("LONG_TEXT_MODE", "truncate")
+WINDOW_STRIDE = int(os.getenv("WINDOW_STRIDE", "128"))
+LONG_TEXT_MAX_WINDOWS = int(os.getenv("LONG_TEXT_MAX_WINDOWS", "8"))
+WINDOW_AGGREGATION = os.getenv("WINDOW_AGGREGATION", "mean")
+
+# Upper bound on the number of texts accepted by POST /api/analyze/batch.
+ANALYZE_BATCH_MAX_TEXTS = int(os.getenv("ANALYZE_BATCH_MAX_TEXTS", "64"))
+
+# Diary and writing-exercise listings return everything unless the client
+# pages: with ``limit`` or ``cursor`` they are paginated newest-first with a
+# (date, id) cursor, PAGE_SIZE rows per page by default and at most
+# MAX_PAGE_SIZE.
+PAGE_SIZE = int(os.getenv("PAGE_SIZE", "100"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "500"))
+
+# /api/analytics reads the daily/weekly mood rollups; a request may span at
+# most ANALYTICS_MAX_PERIODS days or weeks.
+ANALYTICS_DEFAULT_DAYS = int(os.getenv("ANALYTICS_DEFAULT_DAYS", "30"))
+ANALYTICS_MAX_PERIODS = int(os.getenv("ANALYTICS_MAX_PERIODS", "366"))
+
+# On-demand request profiling (see app.profiling). Off unless
+# PROFILING_ENABLED=1; then requests under PROFILING_PATHS are profiled when
+# they send "X-Profile: <PROFILING_TOKEN>" (header triggering is disabled
+# without a token) or are sampled at PROFILING_SAMPLE_RATE. Profiles go to
+# PROFILING_DIR, which keeps the newest PROFILING_MAX_FILES.
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "0") == "1"
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+PROFILING_PATHS = os.getenv("PROFILING_PATHS", "/api/analyze,/users/")
+PROFILING_DIR = os.getenv("PROFILING_DIR", "profiles")
+PROFILING_MAX_FILES = int(os.getenv("PROFILING_MAX_FILES", "50"))
+PROFILING_INTERVAL = float(os.getenv("PROFILING_INTERVAL", "0.001"))
+
+# bcrypt runs in its own process pool of HASHER_WORKERS so it never competes
+# with request threads. Beyond HASHER_MAX_PENDING queued jobs, auth requests
+# are rejected with 503. Hashes with a different BCRYPT_ROUNDS are upgraded on
+# the next successful login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+HASHER_WORKERS = int(os.getenv("HASHER_WORKERS", str(max(1, (os.cpu_count() or 1) // 2))))
+HASHER_MAX_PENDING = int(os.getenv("HASHER_MAX_PENDING", str(HASHER_WORKERS * 8)))
+
+# Password reset links carry a token signed with RESET_TOKEN_SECRET (set the
+# same value on every worker) that expires after RESET_TOKEN_TTL_SECONDS. The
+# API refuses to start without the secret unless DEBUG=1, which falls back to
+# a fixed development secret.
+DEBUG = os.getenv("DEBUG", "0") == "1"
+RESET_TOKEN_SECRET = os.getenv("RESET_TOKEN_SECRET", "")
+RESET_TOKEN_TTL_SECONDS = int(os.getenv("RESET_TOKEN_TTL_SECONDS", "3600"))
+
+# Outgoing mail is queued in the outbound_emails table and delivered by a
+# background dispatcher over up to SMTP_POOL_SIZE reused SMTP connections,
+# MAIL_BATCH_SIZE messages per claim. Failed sends are retried with
+# exponential backoff (MAIL_RETRY_BASE_SECONDS, capped at
+# MAIL_RETRY_MAX_SECONDS) up to MAIL_MAX_ATTEMPTS times. Run
+# `python -m scripts.fake_smtp` and point SMTP_HOST/SMTP_PORT at it locally.
+SMTP_HOST = os.getenv("SMTP_HOST", "localhost")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_USERNAME = os.getenv("SMTP_USERNAME", "")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "")
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "1") == "1"
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "10"))
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "2"))
+SMTP_IDLE_SECONDS = float(os.getenv("SMTP_IDLE_SECONDS", "60"))
+MAIL_FROM = os.getenv("MAIL_FROM", "noreply@yourapp.com")
+MAIL_DISPATCHER_ENABLED = os.getenv("MAIL_DISPATCHER_ENABLED", "1") == "1"
+MAIL_BATCH_SIZE = int(os.getenv("MAIL_BATCH_SIZE", "20"))
+MAIL_POLL_SECONDS = float(os.getenv("MAIL_POLL_SECONDS", "5"))
+MAIL_MAX_ATTEMPTS = int(os.getenv("MAIL_MAX_ATTEMPTS", "6"))
+MAIL_RETRY_BASE_SECONDS = float(os.getenv("MAIL_RETRY_BASE_SECONDS", "30"))
+MAIL_RETRY_MAX_SECONDS = float(os.getenv("MAIL_RETRY_MAX_SECONDS", "3600"))
+PASSWORD_RESET_URL = os.getenv("PASSWORD_RESET_URL", "http://localhost:3000/reset-password")
@@ -0,0 +1,67 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from app.core import config
+from app.core.admission import AdmissionController, Lane
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+
+_executor = None
+_executor_lock = threading.Lock()
+
+admission = AdmissionController(config.ANALYZE_MAX_CONCURRENCY, [
+    Lane(INTERACTIVE, config.ANALYZE_QUEUE_INTERACTIVE, config.ANALYZE_DEADLINE_INTERACTIVE),
+    Lane(BULK, config.ANALYZE_QUEUE_BULK, config.ANALYZE_DEADLINE_BULK),
+])
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=config.ANALYZE_WORKERS,
+                    thread_name_prefix="analyze",
+                )
+    return _executor
+
+
+async def run_in_executor(func, *args, lane: str = INTERACTIVE, **kwargs):
+    """Run blocking inference work off the event loop once ``lane`` is admitted.
+
+    Raises Overloaded instead of queueing when the wait would be too long.
+    """
+    await admission.acquire(lane)
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    try:
+        future = get_executor().submit(partial(func, *args, **kwargs))
+    except BaseException:
+        admission.release(time.perf_counter() - started)
+        raise
+    # The slot is held until the work itself finishes: a request cancelled
+    # while its forward pass runs (client gone) must not free it early.
+    future.add_done_callback(partial(_release_on_loop, loop, started))
+    return await asyncio.wrap_future(future)
+
+
+def _release_on_loop(loop: asyncio.AbstractEventLoop, started: float, future):
+    # Runs on the worker thread; admission is only touched from the loop.
+    service_seconds = time.perf_counter() - started
+    try:
+        loop.call_soon_threadsafe(admission.release, service_seconds)
+    except RuntimeError:
+        pass  # the loop is already closed at shutdown
+
+
+def shutdown_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
@@ -1,6 +1,32 @@
+import asyncio
+import base64
+import functools
+import hashlib
+import hmac
+import logging
+import multiprocessing
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+
 from passlib.context import CryptContext
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.core import config
+
+logger = logging.getLogger(__name__)
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=config.BCRYPT_ROUNDS)
+
+
+class HasherBusy(Exception):
+    """Raised when too many hashing jobs are already queued."""
+
+    def __init__(self, retry_after: int = 1):
+        super().__init__("Authentication is busy, try again shortly.")
+        self.retry_after = retry_after
+
 
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
@@ -8,5 +34,126 @@ def hash_password(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+def verify_and_update(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verifies the password and, when the stored hash uses an outdated work
+    factor, also returns a fresh hash at the configured BCRYPT_ROUNDS."""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
 def get_password_hash(password):
-    return pwd_context.hash(password)
\ No newline at end of file
+    return pwd_context.hash(password)
+
+
+# Only used with DEBUG=1 and no RESET_TOKEN_SECRET, so local setups work
+# without configuration; it is public, so never rely on it in production.
+_DEBUG_RESET_SECRET = b"diploma-debug-reset-token-secret"
+
+
+@functools.lru_cache(maxsize=None)
+def reset_token_secret() -> bytes:
+    """The reset-token signing key. app.main calls this at startup, so a
+    missing RESET_TOKEN_SECRET stops the API instead of failing per request."""
+    if config.RESET_TOKEN_SECRET:
+        return config.RESET_TOKEN_SECRET.encode("utf-8")
+    if not config.DEBUG:
+        raise RuntimeError("RESET_TOKEN_SECRET must be set (or DEBUG=1 to use a fixed development secret)")
+    logger.warning("RESET_TOKEN_SECRET is not set; signing reset tokens with the fixed development secret")
+    return _DEBUG_RESET_SECRET
+
+
+def _reset_signature(user_id: uuid.UUID, expires: int, password_hash: Optional[str]) -> str:
+    # The current password hash is part of the signed message, so changing
+    # the password invalidates every link issued before it: tokens are single
+    # use without being stored anywhere.
+    message = f"{user_id.hex}.{expires}.{password_hash or ''}".encode("utf-8")
+    digest = hmac.new(reset_token_secret(), message, hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode("ascii")
+
+
+def create_reset_token(user_id: uuid.UUID, password_hash: Optional[str]) -> str:
+    """``<user id>.<expiry>.<signature>``, valid for RESET_TOKEN_TTL_SECONDS."""
+    expires = int(time.time()) + config.RESET_TOKEN_TTL_SECONDS
+    return f"{user_id.hex}.{expires}.{_reset_signature(user_id, expires, password_hash)}"
+
+
+def reset_token_user_id(token: str) -> Optional[uuid.UUID]:
+    """The user a well-formed, unexpired token was issued for; None otherwise.
+
+    Only says whose token it claims to be: check it with verify_reset_token
+    against that user's current password hash.
+    """
+    try:
+        user_id, expires, _ = token.split(".")
+        if int(expires) < time.time():
+            return None
+        return uuid.UUID(hex=user_id)
+    except ValueError:
+        return None
+
+
+def verify_reset_token(token: str, user_id: uuid.UUID, password_hash: Optional[str]) -> bool:
+    try:
+        _, expires, signature = token.split(".")
+        expected = _reset_signature(user_id, int(expires), password_hash)
+    except ValueError:
+        return False
+    # Bytes, not str: compare_digest rejects non-ASCII strings with TypeError.
+    return hmac.compare_digest(signature.encode("utf-8"), expected.encode("ascii"))
+
+
+_hasher = None
+_hasher_lock = threading.Lock()
+_hasher_counters = {"pending": 0, "completed": 0, "rejected": 0}
+
+
+def get_hasher() -> ProcessPoolExecutor:
+    global _hasher
+    if _hasher is None:
+        with _hasher_lock:
+            if _hasher is None:
+                # spawn, not fork: the API process already runs torch and
+                # executor threads that must not be duplicated into children.
+                _hasher = ProcessPoolExecutor(
+                    max_workers=config.HASHER_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _hasher
+
+
+async def run_hasher(func, *args):
+    """Run a bcrypt call in the hasher process pool.
+
+    Fails fast with HasherBusy instead of queueing beyond HASHER_MAX_PENDING,
+    so a login storm turns into quick 503s rather than a growing backlog.
+    """
+    if _hasher_counters["pending"] >= config.HASHER_MAX_PENDING:
+        _hasher_counters["rejected"] += 1
+        raise HasherBusy()
+    _hasher_counters["pending"] += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_hasher(), func, *args)
+    finally:
+        _hasher_counters["pending"] -= 1
+        _hasher_counters["completed"] += 1
+
+
+def hash_passwords(passwords) -> list:
+    """Hashes many passwords in parallel; used by the seeding scripts."""
+    return list(get_hasher().map(hash_password, passwords, chunksize=8))
+
+
+def hasher_stats() -> dict:
+    return {
+        "workers": config.HASHER_WORKERS,
+        "max_pending": config.HASHER_MAX_PENDING,
+        "rounds": config.BCRYPT_ROUNDS,
+        **_hasher_counters,
+    }
+
+
+def shutdown_hasher():
+    global _hasher
+    with _hasher_lock:
+        if _hasher is not None:
+            _hasher.shutdown(wait=True)
+            _hasher = None
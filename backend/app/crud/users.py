@@ -1,18 +1,19 @@
 from typing import Optional
 
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.db_models import User
 import uuid
 from datetime import datetime
 
 
-def create_user(
-        db: Session,
+async def create_user(
+        db: AsyncSession,
         email: str,
         name: str,
         password_hash: Optional[str] = None,
         sex: Optional[str] = None,
-        reset_token: Optional[str] = None
+        auth_provider: str = "local"
 ):
     new_user = User(
         id=uuid.uuid4(),
@@ -20,35 +21,41 @@ def create_user(
         password_hash=password_hash,
         name=name,
         sex=sex,
-        reset_token=reset_token,
+        auth_provider=auth_provider,
         created_at=datetime.utcnow(),
         updated_at=datetime.utcnow()
     )
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     return new_user
 
 
 
-def get_user_by_email(db: Session, email: str):
-    return db.query(User).filter(User.email == email).first()
+async def get_user_by_id(db: AsyncSession, user_id):
+    return await db.get(User, user_id)
 
-def update_user_password(db: Session, user_id: str, new_password_hash: str):
-    user = db.query(User).filter(User.id == user_id).first()
+
+async def get_user_by_email(db: AsyncSession, email: str):
+    result = await db.execute(select(User).where(User.email == email))
+    return result.scalars().first()
+
+
+async def update_user_password(db: AsyncSession, user_id, new_password_hash: str):
+    user = await db.get(User, user_id)
     if user:
         user.password_hash = new_password_hash
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
         return user
     return None
 
 
-def update_user_name(db: Session, user_id: str, new_name: str):
-    user = db.query(User).filter(User.id == user_id).first()
+async def update_user_name(db: AsyncSession, user_id, new_name: str):
+    user = await db.get(User, user_id)
     if user:
         user.name = new_name
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
         return user
     return None
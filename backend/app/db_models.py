@@ -1,6 +1,6 @@
 from enum import Enum
 
-from sqlalchemy import Column, String, DateTime, Text, ForeignKey, JSON, Integer
+from sqlalchemy import Column, String, Date, DateTime, Text, ForeignKey, JSON, Integer, Index, LargeBinary
 from sqlalchemy.dialects.postgresql import UUID, ENUM
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
@@ -15,15 +15,19 @@ class User(Base):
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     email = Column(String, unique=True, nullable=False)
-    password_hash = Column(String, nullable=False)
+    # Both unset for accounts created through Google sign-in.
+    password_hash = Column(String, nullable=True)
     name = Column(String, nullable=False)
-    sex = Column(String, nullable=False)
+    sex = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     auth_provider = Column(String, default="local")
+    # No longer written: reset tokens are signed and stateless (see
+    # app.core.security.create_reset_token). Kept for existing databases.
     reset_token = Column(String, nullable=True)
 
     diary_entries = relationship("DiaryEntry", back_populates="user")
+    analyses = relationship("Analysis", back_populates="user")
     writing_entries = relationship("WritingExerciseEntry", back_populates="user")
 
 
@@ -43,6 +47,14 @@ class Tip(Base):
     language = Column(String, nullable=False, default='en')
     emotion = relationship("Emotion", back_populates="tips")
 
+    __table_args__ = (
+        Index("ix_tips_emotion_id_language", "emotion_id", "language"),
+        # Natural key used by the seeding upserts.
+        Index("uq_tips_emotion_id_language_title", "emotion_id", "language", "title", unique=True),
+        # max(updated_at) is part of the catalog version check.
+        Index("ix_tips_updated_at", "updated_at"),
+    )
+
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -61,6 +73,14 @@ class BreathingExercise(Base):
     language = Column(String, nullable=False, default='en')
     emotion = relationship("Emotion", back_populates="breathing_exercises")
 
+    __table_args__ = (
+        Index("ix_breathing_exercises_emotion_id_language", "emotion_id", "language"),
+        Index(
+            "uq_breathing_exercises_emotion_id_language_title", "emotion_id", "language", "title", unique=True
+        ),
+        Index("ix_breathing_exercises_updated_at", "updated_at"),
+    )
+
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -91,6 +111,11 @@ class DiaryEntry(Base):
 
     user = relationship("User", back_populates="diary_entries")
 
+    # Serves the per-user, newest-first keyset pages of /api/diary.
+    __table_args__ = (
+        Index("ix_diary_entries_user_id_date", "user_id", "date", "id"),
+    )
+
 class WritingExerciseEntry(Base):
     __tablename__ = "writing_entries"
 
@@ -99,4 +124,74 @@ class WritingExerciseEntry(Base):
     date = Column(DateTime, default=datetime.utcnow)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
 
-    user = relationship("User", back_populates="writing_entries")
\ No newline at end of file
+    user = relationship("User", back_populates="writing_entries")
+
+    __table_args__ = (
+        Index("ix_writing_entries_user_id_date", "user_id", "date", "id"),
+    )
+
+
+class Analysis(Base):
+    """One analysed diary text.
+
+    Replaces the legacy one-``DiaryEntry``-per-emotion rows: the text is stored
+    once, together with the full score vector (28 float16 values in ``LABELS``
+    order, see ``app.model.pack_scores``) and the ranked top emotions.
+    """
+    __tablename__ = "analyses"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    text = Column(Text, nullable=False)
+    scores = Column(LargeBinary, nullable=True)
+    top_emotions = Column(JSON, nullable=False)
+    language = Column(String, nullable=True)
+    date = Column(DateTime, default=datetime.utcnow)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+
+    user = relationship("User", back_populates="analyses")
+
+    __table_args__ = (
+        Index("ix_analyses_user_id_date", "user_id", "date", "id"),
+    )
+
+
+class MoodRollup(Base):
+    """How often each emotion was among a user's top emotions per day or week.
+
+    Maintained incrementally by the analyze routes (see ``app.rollups``), so
+    mood analytics read a handful of rows per period instead of the user's
+    whole history. ``period_start`` is the day itself or the Monday of the week.
+    """
+    __tablename__ = "mood_rollups"
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), primary_key=True)
+    period = Column(String, primary_key=True)
+    period_start = Column(Date, primary_key=True)
+    emotion = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class OutboundEmail(Base):
+    """A queued email, delivered by ``app.mailer.MailDispatcher``.
+
+    ``status`` moves from pending to sending (claimed by a dispatcher until
+    ``next_attempt_at``) to sent or failed; failed attempts go back to pending
+    with a later ``next_attempt_at``.
+    """
+    __tablename__ = "outbound_emails"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    recipient = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    body = Column(Text, nullable=False)
+    status = Column(String, nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    claim_token = Column(String, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_outbound_emails_status_next_attempt_at", "status", "next_attempt_at"),
+    )
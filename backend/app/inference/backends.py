@@ -0,0 +1,418 @@
+import bisect
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+from app.core import config
+from app.metrics import FORWARD_SECONDS, STAGE_SECONDS
+
+WEIGHT_FILES = ("model.safetensors", "pytorch_model.bin")
+
+
+def model_fingerprint(model_name: str) -> str:
+    """Short hash of the checkpoint's config and weight files, used to key on-disk artifacts."""
+    digest = hashlib.sha256()
+    model_dir = Path(model_name)
+    with open(model_dir / "config.json", "rb") as file:
+        digest.update(json.dumps(json.load(file), sort_keys=True).encode("utf-8"))
+    for name in WEIGHT_FILES:
+        path = model_dir / name
+        if path.exists():
+            stat = path.stat()
+            digest.update(f"{name}:{stat.st_size}:{int(stat.st_mtime)}".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def softmax(logits: np.ndarray) -> np.ndarray:
+    shifted = logits - logits.max(axis=-1, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+
+def _configure_torch_threads():
+    import torch
+
+    if config.TORCH_NUM_THREADS > 0:
+        torch.set_num_threads(config.TORCH_NUM_THREADS)
+    if config.TORCH_NUM_INTEROP_THREADS > 0:
+        try:
+            torch.set_num_interop_threads(config.TORCH_NUM_INTEROP_THREADS)
+        except RuntimeError:
+            # Can only be set once per process, before any parallel work ran.
+            pass
+
+
+PRECISIONS = ("fp32", "int8", "bf16")
+TORCH_COMPILE_MODES = ("off", "trace", "compile")
+LONG_TEXT_MODES = ("truncate", "window")
+WINDOW_AGGREGATIONS = ("mean", "max")
+
+# Sequences in one forward pass are padded to the longest of them, so batches
+# are formed from windows of similar length: a short check-in never pays for
+# the padding of a long entry scored alongside it.
+LENGTH_BUCKETS = (32, 64, 128, 256, 512)
+
+
+def _load_torch_model(model_name: str, precision: str = "fp32"):
+    import torch
+    from transformers import AutoModelForSequenceClassification
+
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown MODEL_PRECISION '{precision}', expected one of {PRECISIONS}")
+
+    _configure_torch_threads()
+    model = AutoModelForSequenceClassification.from_pretrained(model_name)
+    model.eval()
+    if precision == "int8":
+        # Linear layers carry almost all of XLM-R's compute outside the
+        # embedding table; weights are stored as int8 and activations are
+        # quantized on the fly per batch.
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    elif precision == "bf16":
+        model = model.to(torch.bfloat16)
+    return model
+
+
+class SequenceBackend:
+    """Tokenization, long-text windowing and length bucketing shared by the backends.
+
+    Subclasses only implement ``_forward``, which maps padded ``input_ids`` and
+    ``attention_mask`` arrays to logits. With ``LONG_TEXT_MODE=window`` a text
+    longer than the model's maximum length is split into overlapping windows,
+    every window is scored and the window probabilities are combined with
+    ``WINDOW_AGGREGATION``; otherwise only its leading tokens are scored.
+
+    Batches are padded to their longest sequence, or with ``pad_to_bucket``
+    to the full length of their bucket, so the model only ever sees the
+    bucket shapes.
+    """
+
+    pad_to_bucket = False
+    # Batch sizes run per bucket by the engine's warm-up pass.
+    warmup_batch_sizes = (1,)
+
+    def __init__(self, tokenizer):
+        if config.LONG_TEXT_MODE not in LONG_TEXT_MODES:
+            raise ValueError(f"Unknown LONG_TEXT_MODE '{config.LONG_TEXT_MODE}', expected one of {LONG_TEXT_MODES}")
+        if config.WINDOW_AGGREGATION not in WINDOW_AGGREGATIONS:
+            raise ValueError(
+                f"Unknown WINDOW_AGGREGATION '{config.WINDOW_AGGREGATION}', expected one of {WINDOW_AGGREGATIONS}"
+            )
+        self.tokenizer = tokenizer
+        self.max_length = min(tokenizer.model_max_length, LENGTH_BUCKETS[-1])
+        self.buckets = tuple(sorted({min(length, self.max_length) for length in LENGTH_BUCKETS}))
+        # The overlap must leave room for new tokens in every window.
+        content_length = self.max_length - tokenizer.num_special_tokens_to_add()
+        self.stride = min(config.WINDOW_STRIDE, content_length // 2)
+
+    def __call__(self, texts) -> List[List[float]]:
+        with STAGE_SECONDS.time("tokenize"):
+            windows, owners = self._encode(texts)
+
+        logits = [None] * len(windows)
+        for bucket, group in self._length_batches(windows):
+            input_ids, attention_mask = self._pad([windows[i] for i in group], bucket)
+            started = time.perf_counter()
+            group_logits = self._forward(input_ids, attention_mask)
+            elapsed = time.perf_counter() - started
+            STAGE_SECONDS.observe(elapsed, "forward")
+            FORWARD_SECONDS.observe(elapsed, str(bucket))
+            for i, row in zip(group, group_logits):
+                logits[i] = row
+
+        with STAGE_SECONDS.time("softmax"):
+            probs = softmax(np.asarray(logits, dtype=np.float32))
+            return self._aggregate(probs, owners, len(texts)).tolist()
+
+    def _encode(self, texts):
+        """Returns the token ids of every window and the index of the text it belongs to."""
+        if config.LONG_TEXT_MODE == "truncate":
+            encoded = self.tokenizer(list(texts), truncation=True, max_length=self.max_length)
+            return encoded["input_ids"], list(range(len(texts)))
+
+        encoded = self.tokenizer(
+            list(texts),
+            truncation=True,
+            max_length=self.max_length,
+            stride=self.stride,
+            return_overflowing_tokens=True,
+        )
+        windows, owners, per_text = [], [], {}
+        for ids, owner in zip(encoded["input_ids"], encoded["overflow_to_sample_mapping"]):
+            per_text[owner] = per_text.get(owner, 0) + 1
+            if per_text[owner] <= config.LONG_TEXT_MAX_WINDOWS:
+                windows.append(ids)
+                owners.append(owner)
+        return windows, owners
+
+    def bucket_for(self, length: int) -> int:
+        return self.buckets[bisect.bisect_left(self.buckets, length)]
+
+    def _length_batches(self, windows):
+        """Groups window indices by length bucket; returns (bucket, indices) pairs."""
+        order = sorted(range(len(windows)), key=lambda i: len(windows[i]))
+        groups, current, current_bucket = [], [], None
+        for i in order:
+            bucket = self.bucket_for(len(windows[i]))
+            if current and (bucket != current_bucket or len(current) >= config.BATCH_MAX_SIZE):
+                groups.append((current_bucket, current))
+                current = []
+            current.append(i)
+            current_bucket = bucket
+        if current:
+            groups.append((current_bucket, current))
+        return groups
+
+    def _pad(self, windows, bucket: int):
+        width = bucket if self.pad_to_bucket else max(len(ids) for ids in windows)
+        input_ids = np.full((len(windows), width), self.tokenizer.pad_token_id, dtype=np.int64)
+        attention_mask = np.zeros((len(windows), width), dtype=np.int64)
+        for row, ids in enumerate(windows):
+            input_ids[row, :len(ids)] = ids
+            attention_mask[row, :len(ids)] = 1
+        return input_ids, attention_mask
+
+    @staticmethod
+    def _aggregate(probs: np.ndarray, owners, count: int) -> np.ndarray:
+        if len(owners) == count:
+            return probs
+        owners = np.asarray(owners)
+        scores = np.zeros((count, probs.shape[1]), dtype=np.float32)
+        if config.WINDOW_AGGREGATION == "max":
+            np.maximum.at(scores, owners, probs)
+            return scores
+        np.add.at(scores, owners, probs)
+        return scores / np.bincount(owners, minlength=count)[:, None]
+
+    def _forward(self, input_ids: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+
+def _logits_module(model):
+    import torch
+
+    class LogitsOnly(torch.nn.Module):
+        """Takes (input_ids, attention_mask) positionally and returns bare logits,
+        the signature tracing and compiling work with."""
+
+        def __init__(self, wrapped):
+            super().__init__()
+            self.wrapped = wrapped
+
+        def forward(self, input_ids, attention_mask):
+            return self.wrapped(input_ids=input_ids, attention_mask=attention_mask).logits
+
+    return LogitsOnly(model).eval()
+
+
+class TorchBackend(SequenceBackend):
+    """Eager PyTorch, or with ``TORCH_COMPILE`` a compiled forward pass.
+
+    ``trace`` runs a frozen TorchScript trace, saved under
+    ``MODEL_CACHE_DIR/torchscript`` keyed by model fingerprint and precision,
+    so later restarts load it without building the transformers model.
+    ``compile`` runs ``torch.compile`` with one static graph per length bucket
+    (the batch dimension stays dynamic); inductor keeps its kernels under
+    ``MODEL_CACHE_DIR/inductor``. Both check their output against the eager
+    model when they are first built.
+    """
+
+    name = "torch"
+
+    def __init__(self, model_name: str, tokenizer, precision: str = None, compile_mode: str = None):
+        super().__init__(tokenizer)
+        self.precision = precision or config.MODEL_PRECISION
+        self.compile_mode = compile_mode or config.TORCH_COMPILE
+        if self.compile_mode not in TORCH_COMPILE_MODES:
+            raise ValueError(f"Unknown TORCH_COMPILE '{self.compile_mode}', expected one of {TORCH_COMPILE_MODES}")
+        if self.compile_mode == "off":
+            self.model = _load_torch_model(model_name, self.precision)
+            return
+
+        self.pad_to_bucket = True
+        # Batch size 1 gets a graph of its own; any larger batch shares one.
+        self.warmup_batch_sizes = (2, 1)
+        if self.compile_mode == "trace":
+            self.model = self._load_traced(model_name)
+        else:
+            self.model = self._compile(model_name)
+
+    def _forward(self, input_ids, attention_mask):
+        import torch
+
+        input_ids = torch.from_numpy(input_ids)
+        attention_mask = torch.from_numpy(attention_mask)
+        with torch.no_grad():
+            if self.compile_mode == "off":
+                # The attention mask keeps padding from changing the scores of
+                # shorter windows in the same batch.
+                logits = self.model(input_ids=input_ids, attention_mask=attention_mask).logits
+            else:
+                if self.compile_mode == "compile":
+                    torch._dynamo.mark_dynamic(input_ids, 0)
+                    torch._dynamo.mark_dynamic(attention_mask, 0)
+                logits = self.model(input_ids, attention_mask)
+        return logits.float().numpy()
+
+    def _sample(self, length: int):
+        texts = ["Сьогодні був дуже гарний день.", "I feel nervous about tomorrow"]
+        ids = self.tokenizer(texts, truncation=True, max_length=length)["input_ids"]
+        return self._pad(ids, length)
+
+    def _check_compiled(self, eager):
+        import torch
+
+        for length in (self.buckets[0], self.buckets[-1]):
+            input_ids, attention_mask = self._sample(length)
+            with torch.no_grad():
+                expected = eager(torch.from_numpy(input_ids), torch.from_numpy(attention_mask)).float().numpy()
+            drift = float(np.abs(softmax(self._forward(input_ids, attention_mask)) - softmax(expected)).max())
+            if drift > config.TORCH_COMPILE_TOLERANCE:
+                raise RuntimeError(
+                    f"TORCH_COMPILE={self.compile_mode} drifts from eager PyTorch by {drift:.2e} "
+                    f"at {length} tokens (> {config.TORCH_COMPILE_TOLERANCE})"
+                )
+
+    def _load_traced(self, model_name: str):
+        import torch
+
+        path = Path(config.MODEL_CACHE_DIR) / "torchscript" / f"model-{model_fingerprint(model_name)}-{self.precision}.pt"
+        if path.exists():
+            _configure_torch_threads()
+            return torch.jit.load(str(path), map_location="cpu")
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        eager = _logits_module(_load_torch_model(model_name, self.precision))
+        input_ids, attention_mask = self._sample(self.buckets[0])
+        with torch.no_grad():
+            traced = torch.jit.trace(
+                eager, (torch.from_numpy(input_ids), torch.from_numpy(attention_mask)), check_trace=False
+            )
+            self.model = torch.jit.freeze(traced)
+        self._check_compiled(eager)
+        # Save next to the final path and rename, so concurrently starting
+        # workers never load a half-written file.
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        torch.jit.save(self.model, str(tmp_path))
+        os.replace(tmp_path, path)
+        return self.model
+
+    def _compile(self, model_name: str):
+        import torch
+
+        # Importing transformers already pins inductor to a default /tmp cache,
+        # so this has to overwrite it rather than set a default.
+        os.environ["TORCHINDUCTOR_CACHE_DIR"] = str(
+            Path(config.MODEL_CACHE_DIR) / "inductor" / model_fingerprint(model_name)
+        )
+        # Two graphs per bucket (batch 1 and batch >= 2) must all stay cached.
+        torch._dynamo.config.cache_size_limit = max(torch._dynamo.config.cache_size_limit, 4 * len(self.buckets))
+        eager = _logits_module(_load_torch_model(model_name, self.precision))
+        self.model = torch.compile(eager, dynamic=False)
+        self._check_compiled(eager)
+        return self.model
+
+
+class OnnxBackend(SequenceBackend):
+    """Serves the classifier through ONNX Runtime on CPU.
+
+    The checkpoint is exported once and cached under ``ONNX_CACHE_DIR`` keyed by
+    the model fingerprint, so later restarts load the ONNX graph without ever
+    building the PyTorch model.
+    """
+
+    name = "onnx"
+
+    def __init__(self, model_name: str, tokenizer):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise RuntimeError("INFERENCE_BACKEND=onnx requires the onnxruntime package") from e
+
+        super().__init__(tokenizer)
+        self.path = self.export(model_name, tokenizer)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if config.TORCH_NUM_THREADS > 0:
+            options.intra_op_num_threads = config.TORCH_NUM_THREADS
+        if config.TORCH_NUM_INTEROP_THREADS > 0:
+            options.inter_op_num_threads = config.TORCH_NUM_INTEROP_THREADS
+        self.session = ort.InferenceSession(
+            str(self.path), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+
+    def _forward(self, input_ids, attention_mask):
+        (logits,) = self.session.run(["logits"], {"input_ids": input_ids, "attention_mask": attention_mask})
+        return logits.astype(np.float32)
+
+    @staticmethod
+    def export(model_name: str, tokenizer) -> Path:
+        path = Path(config.ONNX_CACHE_DIR) / f"model-{model_fingerprint(model_name)}.onnx"
+        if path.exists():
+            return path
+
+        import torch
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        model = _load_torch_model(model_name)
+        sample = tokenizer(
+            ["Сьогодні був дуже гарний день.", "I feel nervous about tomorrow"],
+            return_tensors="pt", padding=True, truncation=True,
+        )
+        # Export next to the final path and rename, so concurrently starting
+        # workers never load a half-written file.
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        torch.onnx.export(
+            model,
+            (sample["input_ids"], sample["attention_mask"]),
+            str(tmp_path),
+            input_names=["input_ids", "attention_mask"],
+            output_names=["logits"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "logits": {0: "batch"},
+            },
+            opset_version=17,
+            dynamo=False,
+        )
+        _check_export(model, tmp_path, sample)
+        os.replace(tmp_path, path)
+        return path
+
+
+def _check_export(model, path: Path, sample):
+    import onnxruntime as ort
+    import torch
+
+    with torch.no_grad():
+        expected = torch.softmax(model(**sample).logits, dim=-1).numpy()
+    session = ort.InferenceSession(str(path), providers=["CPUExecutionProvider"])
+    (logits,) = session.run(["logits"], {
+        "input_ids": sample["input_ids"].numpy(),
+        "attention_mask": sample["attention_mask"].numpy(),
+    })
+    drift = float(np.abs(softmax(logits) - expected).max())
+    if drift > config.ONNX_TOLERANCE:
+        os.remove(path)
+        raise RuntimeError(f"ONNX export drifts from PyTorch by {drift:.2e} (> {config.ONNX_TOLERANCE})")
+
+
+BACKENDS = {
+    TorchBackend.name: TorchBackend,
+    OnnxBackend.name: OnnxBackend,
+}
+
+
+def load_backend(name: str, model_name: str, tokenizer):
+    try:
+        backend_cls = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown INFERENCE_BACKEND '{name}', expected one of {sorted(BACKENDS)}")
+    return backend_cls(model_name, tokenizer)
@@ -0,0 +1,78 @@
+import threading
+import time
+from concurrent.futures import Future
+from queue import Queue, Empty
+from typing import Callable, List, Optional, Sequence
+
+
+class MicroBatcher:
+    """Groups concurrent scoring requests into a single padded forward pass.
+
+    Callers block in ``score`` while one worker thread drains the queue: it
+    takes the first waiting text, then keeps collecting for at most
+    ``max_wait_ms`` or until ``max_batch_size`` texts are queued, and hands the
+    whole group to ``score_batch``. Each caller gets back its own score vector.
+    """
+
+    def __init__(
+            self,
+            score_batch: Callable[[List[str]], Sequence[Sequence[float]]],
+            max_batch_size: int = 16,
+            max_wait_ms: float = 10.0,
+    ):
+        self.score_batch = score_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue: Queue = Queue()
+        self._worker = threading.Thread(target=self._run, name="inference-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, text: str) -> Future:
+        future: Future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def score(self, text: str, timeout: Optional[float] = None) -> List[float]:
+        return self.submit(text).result(timeout)
+
+    def close(self):
+        self._queue.put(None)
+        self._worker.join()
+
+    def _collect(self, first) -> tuple:
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get_nowait() if remaining <= 0 else self._queue.get(timeout=remaining)
+            except Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch, stop = self._collect(first)
+            self._process(batch)
+            if stop:
+                return
+
+    def _process(self, batch):
+        # Drop requests whose callers gave up before we got to them.
+        batch = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        try:
+            scores = self.score_batch([text for text, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), row in zip(batch, scores):
+            future.set_result(list(row))
@@ -0,0 +1,193 @@
+import hashlib
+import itertools
+import os
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional
+
+
+def normalize_text(text: str) -> str:
+    # Resubmitted diary texts usually differ only in Unicode composition or
+    # whitespace; case and punctuation are kept since the model sees them.
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def cache_key(text: str, model_version: str) -> str:
+    digest = hashlib.sha256()
+    digest.update(model_version.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(normalize_text(text).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class FileCacheBackend:
+    """Score vectors shared between worker processes through a local directory.
+
+    Each entry is a small file of packed float32 values named after its key;
+    writes go through a temporary file and ``os.replace`` so readers in other
+    processes never see a partial vector. Expiry uses the file mtime: expired
+    files are deleted when read, and every ``max_entries // 10`` writes a
+    sweep deletes all expired files and then the oldest ones until the
+    directory is back under 90% of ``max_entries``. Each process counts its
+    own writes, so the directory can briefly overshoot by that many per worker.
+    """
+
+    def __init__(self, directory: str, ttl_seconds: float, max_entries: int):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        self.sweep_every = max(1, max_entries // 10)
+        # next() on a count is atomic, so concurrent writes from the executor
+        # threads each get their own number; every sweep_every-th write
+        # sweeps, unless a sweep is already running.
+        self._puts = itertools.count(1)
+        self._sweeping = threading.Lock()
+        self.removed = 0
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / key
+
+    def get(self, key: str) -> Optional[List[float]]:
+        path = self._path(key)
+        try:
+            if time.time() - path.stat().st_mtime > self.ttl:
+                path.unlink(missing_ok=True)
+                return None
+            data = path.read_bytes()
+        except OSError:
+            return None
+        scores = array("f")
+        scores.frombytes(data)
+        return scores.tolist()
+
+    def put(self, key: str, scores: List[float]):
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        tmp_path = path.with_name(f"{key}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            tmp_path.write_bytes(array("f", scores).tobytes())
+            os.replace(tmp_path, path)
+        except OSError:
+            tmp_path.unlink(missing_ok=True)
+        if next(self._puts) % self.sweep_every == 0 and self._sweeping.acquire(blocking=False):
+            try:
+                self.sweep()
+            finally:
+                self._sweeping.release()
+
+    def sweep(self):
+        """Deletes expired entries, then the oldest until under the size bound."""
+        expired_before = time.time() - self.ttl
+        entries = []
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(".tmp"):
+                    continue
+                try:
+                    mtime = entry.stat().st_mtime
+                except OSError:
+                    continue
+                if mtime < expired_before:
+                    self._remove(entry.path)
+                else:
+                    entries.append((mtime, entry.path))
+        if len(entries) > self.max_entries:
+            entries.sort()
+            for _, path in entries[:len(entries) - self.max_entries * 9 // 10]:
+                self._remove(path)
+
+    def _remove(self, path: str):
+        try:
+            os.unlink(path)
+            self.removed += 1
+        except OSError:
+            pass
+
+
+class PredictionCache:
+    """Bounded LRU cache of emotion score vectors with a per-entry TTL.
+
+    Misses in the process-local LRU fall through to the optional shared
+    backend before the caller runs the model.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, shared: Optional[FileCacheBackend] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.shared = shared
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def get(self, key: str) -> Optional[List[float]]:
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, scores = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return scores
+                del self._entries[key]
+                self.expirations += 1
+
+        if self.shared is not None:
+            scores = self.shared.get(key)
+            if scores is not None:
+                self._store(key, scores)
+                with self._lock:
+                    self.shared_hits += 1
+                return scores
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, scores: List[float]):
+        if not self.enabled:
+            return
+        self._store(key, scores)
+        if self.shared is not None:
+            self.shared.put(key, scores)
+
+    def _store(self, key: str, scores: List[float]):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, scores)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
@@ -0,0 +1,128 @@
+import socket
+import threading
+import time
+from typing import List, Optional
+
+from app.core import config
+from app.inference import protocol
+from app.inference.engine import ModelNotReady
+
+
+class RemoteEngine:
+    """Stands in for ModelEngine when MODEL_SERVER_SOCKET is set.
+
+    Scores on the shared model server (app.inference.server) instead of
+    loading a model, so the API worker never imports torch or transformers.
+    Calls block, like ModelEngine's, and run on the analyze executor; each
+    thread borrows one of the pooled connections for the duration of a call.
+    """
+
+    def __init__(self, socket_path: str, timeout: float = config.MODEL_SERVER_TIMEOUT):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._idle: List[socket.socket] = []
+        self._lock = threading.Lock()
+        self._model_version: Optional[str] = None
+
+    def start(self):
+        # The model server loads the model; there is nothing to start here.
+        pass
+
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        # The server may have been restarted with another model.
+        self._model_version = None
+        return sock
+
+    def _request(self, payload: bytes) -> bytes:
+        with self._lock:
+            sock = self._idle.pop() if self._idle else None
+        reused = sock is not None
+        while True:
+            sent = False
+            try:
+                if sock is None:
+                    sock = self._connect()
+                protocol.send_frame(sock, payload)
+                sent = True
+                response = protocol.recv_frame(sock)
+            except (OSError, EOFError, protocol.ProtocolError) as e:
+                if sock is not None:
+                    sock.close()
+                    sock = None
+                # A pooled connection may have been dropped by a server
+                # restart: retry once on a fresh one. Never after a timeout,
+                # or when the request went out and the connection did not
+                # simply close, since the server may already be scoring it.
+                dropped = isinstance(e, (EOFError, ConnectionResetError, BrokenPipeError))
+                if reused and not isinstance(e, TimeoutError) and (not sent or dropped):
+                    reused = False
+                    continue
+                raise ModelNotReady("unavailable") from e
+            with self._lock:
+                self._idle.append(sock)
+            return response
+
+    def _call(self, payload: bytes) -> bytes:
+        status, body = protocol.split_response(self._request(payload))
+        if status != protocol.OK:
+            error = protocol.decode_json(body)
+            if error.get("state") == "error":
+                raise RuntimeError(f"Model server error: {error.get('error')}")
+            raise ModelNotReady(error.get("state", "unavailable"))
+        return body
+
+    @property
+    def model_version(self) -> str:
+        if self._model_version is None:
+            status = self.status()
+            if status["state"] != "ready":
+                raise ModelNotReady(status["state"])
+            self._model_version = status["model_version"]
+        return self._model_version
+
+    @property
+    def state(self) -> str:
+        return self.status()["state"]
+
+    def wait_ready(self, timeout: Optional[float] = None):
+        deadline = time.monotonic() + (timeout if timeout is not None else self.timeout)
+        while True:
+            state = self.state
+            if state == "ready":
+                return
+            if state == "failed" or time.monotonic() >= deadline:
+                raise ModelNotReady(state)
+            time.sleep(0.2)
+
+    def score(self, text: str) -> List[float]:
+        return self.score_batch([text])[0]
+
+    def score_batch(self, texts: List[str]) -> List[List[float]]:
+        return protocol.decode_scores(self._call(protocol.encode_score_request(texts)))
+
+    def status(self) -> dict:
+        try:
+            status = protocol.decode_json(self._call(bytes([protocol.OP_STATUS])))
+        except ModelNotReady as e:
+            status = {
+                "state": e.state,
+                "model": config.MODEL_NAME,
+                "backend": config.INFERENCE_BACKEND,
+                "warmup": [],
+                "error": f"Model server at {self.socket_path} is not reachable",
+            }
+        status["server"] = self.socket_path
+        return status
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for sock in idle:
+            sock.close()
@@ -0,0 +1,154 @@
+import logging
+import resource
+import threading
+import time
+from typing import List, Optional
+
+from app.core import config
+from app.inference.batching import MicroBatcher
+
+logger = logging.getLogger(__name__)
+
+# Filler word for warm-up texts, repeated to fill each length bucket.
+WARMUP_WORD = "сьогодні"
+
+
+class ModelNotReady(Exception):
+    def __init__(self, state: str, retry_after: int = 5):
+        super().__init__(f"Model is not ready (state: {state})")
+        self.state = state
+        self.retry_after = retry_after
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is reported in kilobytes on Linux.
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+class ModelEngine:
+    """Owns the tokenizer, inference backend and batcher for one process.
+
+    Nothing heavy is imported or loaded until ``start`` (or the first score
+    call) runs, so API workers can serve non-model routes immediately while the
+    weights load and warm up on a background thread.
+    """
+
+    def __init__(self, model_name: str, backend_name: str):
+        self.model_name = model_name
+        self.backend_name = backend_name
+        self.state = "idle"
+        self.error: Optional[str] = None
+        self.tokenizer = None
+        self.backend = None
+        self.batcher: Optional[MicroBatcher] = None
+        self.created = time.perf_counter()
+        self.load_seconds: Optional[float] = None
+        self.cold_start_seconds: Optional[float] = None
+        self.warmup: List[dict] = []
+        self.peak_rss_mb: Optional[float] = None
+        # Part of the prediction cache key: how inputs past the model's max
+        # length are scored changes the scores of long texts.
+        self.truncation = config.LONG_TEXT_MODE
+        if config.LONG_TEXT_MODE == "window":
+            self.truncation = (
+                f"window-{config.WINDOW_AGGREGATION}-{config.WINDOW_STRIDE}-{config.LONG_TEXT_MAX_WINDOWS}"
+            )
+        self._model_version: Optional[str] = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self.state = "loading"
+            self._thread = threading.Thread(target=self._load, name="model-loader", daemon=True)
+            self._thread.start()
+
+    def _load(self):
+        started = time.perf_counter()
+        try:
+            from transformers import AutoTokenizer
+            from app.inference.backends import load_backend
+
+            self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+            self.backend = load_backend(self.backend_name, self.model_name, self.tokenizer)
+            self.load_seconds = round(time.perf_counter() - started, 3)
+            self.state = "warming"
+            self._warm_up()
+            self.batcher = MicroBatcher(self.backend, config.BATCH_MAX_SIZE, config.BATCH_MAX_WAIT_MS)
+        except Exception as e:
+            logger.exception("Model loading failed")
+            self.state = "failed"
+            self.error = str(e)
+        else:
+            self.state = "ready"
+        finally:
+            self.cold_start_seconds = round(time.perf_counter() - self.created, 3)
+            self.peak_rss_mb = _peak_rss_mb()
+            self._ready.set()
+            logger.info(
+                "Model %s: state=%s load=%ss warm-up=%.3fs cold start=%ss peak_rss=%sMB",
+                self.model_name, self.state, self.load_seconds,
+                sum(step["seconds"] for step in self.warmup), self.cold_start_seconds, self.peak_rss_mb,
+            )
+
+    def _warm_up(self):
+        """Runs every sequence-length bucket once at each warm-up batch size, so
+        lazy initialisation (and graph compilation in compiled modes) happens
+        before traffic, then records that bucket's steady single-text latency."""
+        for bucket in self.backend.buckets:
+            ids = self.tokenizer(" ".join([WARMUP_WORD] * bucket), truncation=True, max_length=bucket)["input_ids"]
+            text = self.tokenizer.decode(ids, skip_special_tokens=True)
+            started = time.perf_counter()
+            for batch_size in self.backend.warmup_batch_sizes:
+                self.backend([text] * batch_size)
+            warmed = time.perf_counter()
+            self.backend([text])
+            self.warmup.append({
+                "tokens": bucket,
+                "seconds": round(warmed - started, 4),
+                "latency_ms": round((time.perf_counter() - warmed) * 1000, 2),
+            })
+
+    @property
+    def model_version(self) -> str:
+        """Identifies the checkpoint and inference settings that produced a score vector."""
+        if self._model_version is None:
+            from app.inference.backends import model_fingerprint
+
+            parts = [model_fingerprint(self.model_name), self.backend_name]
+            if self.backend_name == "torch":
+                parts.append(config.MODEL_PRECISION)
+            parts.append(self.truncation)
+            self._model_version = "/".join(parts)
+        return self._model_version
+
+    def wait_ready(self, timeout: Optional[float] = None):
+        self.start()
+        if not self._ready.wait(timeout) or self.state != "ready":
+            raise ModelNotReady(self.state)
+
+    def score(self, text: str) -> List[float]:
+        self.wait_ready(config.MODEL_READY_TIMEOUT)
+        return self.batcher.score(text)
+
+    def score_batch(self, texts: List[str]) -> List[List[float]]:
+        # Queued like single texts, so the batcher's worker stays the only
+        # thread calling the backend and splits them into its usual batches.
+        self.wait_ready(config.MODEL_READY_TIMEOUT)
+        futures = [self.batcher.submit(text) for text in texts]
+        return [future.result() for future in futures]
+
+    def status(self) -> dict:
+        return {
+            "state": self.state,
+            "model": self.model_name,
+            "backend": self.backend_name,
+            "load_seconds": self.load_seconds,
+            "cold_start_seconds": self.cold_start_seconds,
+            "warmup": self.warmup,
+            "peak_rss_mb": self.peak_rss_mb if self.peak_rss_mb is not None else _peak_rss_mb(),
+            "error": self.error,
+        }
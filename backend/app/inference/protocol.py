@@ -0,0 +1,123 @@
+"""Wire format between API workers and the model server (app.inference.server).
+
+Every message is a frame: a 4-byte big-endian payload length, then the
+payload. Requests start with a one-byte opcode, responses with a one-byte
+status; integers in the body are little-endian u32.
+
+    SCORE   request   op | count | count x (length | utf-8 text)
+            response  OK | rows | columns | rows x columns float32
+    STATUS  request   op
+            response  OK | utf-8 JSON object
+    (any)   response  ERROR | utf-8 JSON {"state": ..., "error": ...}
+
+Scores travel as float32, the precision the backends compute in, so a remote
+score is bit-identical to a local one.
+"""
+import json
+import socket
+import struct
+import sys
+from array import array
+from typing import List, Sequence, Tuple
+
+OP_SCORE = 1
+OP_STATUS = 2
+
+OK = 0
+ERROR = 1
+
+MAX_FRAME_BYTES = 64 << 20
+
+_FRAME_LENGTH = struct.Struct(">I")
+_U32 = struct.Struct("<I")
+_SHAPE = struct.Struct("<II")
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def send_frame(sock: socket.socket, payload: bytes):
+    sock.sendall(_FRAME_LENGTH.pack(len(payload)) + payload)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if not count:
+            # A peer closing between frames is a normal end of conversation.
+            raise EOFError if received == 0 else ConnectionError("Connection closed mid-frame")
+        received += count
+    return bytes(buffer)
+
+
+def recv_frame(sock: socket.socket) -> bytes:
+    (length,) = _FRAME_LENGTH.unpack(_recv_exact(sock, _FRAME_LENGTH.size))
+    if length > MAX_FRAME_BYTES:
+        raise ProtocolError(f"Frame of {length} bytes exceeds the {MAX_FRAME_BYTES} byte limit")
+    return _recv_exact(sock, length)
+
+
+def encode_score_request(texts: Sequence[str]) -> bytes:
+    parts = [bytes([OP_SCORE]), _U32.pack(len(texts))]
+    for text in texts:
+        data = text.encode("utf-8")
+        parts.append(_U32.pack(len(data)))
+        parts.append(data)
+    return b"".join(parts)
+
+
+def decode_score_request(payload: bytes) -> List[str]:
+    (count,) = _U32.unpack_from(payload, 1)
+    offset = 1 + _U32.size
+    texts = []
+    for _ in range(count):
+        (length,) = _U32.unpack_from(payload, offset)
+        offset += _U32.size
+        texts.append(payload[offset:offset + length].decode("utf-8"))
+        offset += length
+    if offset != len(payload):
+        raise ProtocolError("Trailing bytes after the last text")
+    return texts
+
+
+def _float32(values) -> array:
+    data = array("f", values)
+    if sys.byteorder == "big":
+        data.byteswap()
+    return data
+
+
+def encode_scores(rows: Sequence[Sequence[float]]) -> bytes:
+    columns = len(rows[0]) if rows else 0
+    data = _float32(value for row in rows for value in row)
+    return bytes([OK]) + _SHAPE.pack(len(rows), columns) + data.tobytes()
+
+
+def decode_scores(body: bytes) -> List[List[float]]:
+    rows, columns = _SHAPE.unpack_from(body)
+    data = array("f")
+    data.frombytes(body[_SHAPE.size:])
+    if sys.byteorder == "big":
+        data.byteswap()
+    if len(data) != rows * columns:
+        raise ProtocolError(f"Expected {rows}x{columns} scores, got {len(data)}")
+    values = data.tolist()
+    return [values[i * columns:(i + 1) * columns] for i in range(rows)]
+
+
+def encode_json(status: int, content: dict) -> bytes:
+    return bytes([status]) + json.dumps(content).encode("utf-8")
+
+
+def decode_json(body: bytes) -> dict:
+    return json.loads(body.decode("utf-8"))
+
+
+def split_response(payload: bytes) -> Tuple[int, bytes]:
+    if not payload:
+        raise ProtocolError("Empty response")
+    return payload[0], payload[1:]
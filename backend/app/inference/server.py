@@ -0,0 +1,117 @@
+"""Dedicated model server: one model instance shared by every API worker on a node.
+
+Loads the model exactly like an API worker would (same MODEL_NAME, backend,
+precision and long-text settings) and answers SCORE and STATUS requests over
+a Unix domain socket (see app.inference.protocol). Every scoring request from
+all workers goes through one micro-batcher, so concurrent analyses from
+different workers share forward passes. Start it before the API and give
+both the same MODEL_SERVER_SOCKET:
+
+    python -m app.inference.server [--socket /run/diploma/model.sock]
+"""
+import argparse
+import logging
+import os
+import signal
+import socket
+import socketserver
+import stat
+import threading
+
+from app.core import config
+from app.inference import protocol
+from app.inference.engine import ModelEngine, ModelNotReady
+
+logger = logging.getLogger(__name__)
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        engine = self.server.engine
+        while True:
+            try:
+                payload = protocol.recv_frame(self.request)
+            except (EOFError, ConnectionError):
+                return
+            protocol.send_frame(self.request, self.respond(engine, payload))
+
+    @staticmethod
+    def respond(engine: ModelEngine, payload: bytes) -> bytes:
+        try:
+            op = payload[0] if payload else None
+            if op == protocol.OP_SCORE:
+                return protocol.encode_scores(engine.score_batch(protocol.decode_score_request(payload)))
+            if op == protocol.OP_STATUS:
+                status = engine.status()
+                if engine.state == "ready":
+                    status["model_version"] = engine.model_version
+                return protocol.encode_json(protocol.OK, status)
+            raise protocol.ProtocolError(f"Unknown opcode {op}")
+        except ModelNotReady as e:
+            return protocol.encode_json(protocol.ERROR, {"state": e.state, "error": str(e)})
+        except Exception as e:
+            logger.exception("Model server request failed")
+            return protocol.encode_json(protocol.ERROR, {"state": "error", "error": str(e)})
+
+
+class ModelServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, engine: ModelEngine):
+        _remove_stale_socket(socket_path)
+        super().__init__(socket_path, _Handler)
+        self.socket_path = socket_path
+        self.engine = engine
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+def _remove_stale_socket(socket_path: str):
+    """Removes a socket file left behind by a killed server, so bind can
+    succeed; refuses to touch a live server's socket or any other file."""
+    try:
+        mode = os.stat(socket_path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise RuntimeError(f"{socket_path} exists and is not a socket")
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+    except ConnectionRefusedError:
+        os.unlink(socket_path)
+        return
+    finally:
+        probe.close()
+    raise RuntimeError(f"Another model server is already listening on {socket_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--socket", default=config.MODEL_SERVER_SOCKET or "/tmp/diploma-model.sock")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+
+    engine = ModelEngine(config.MODEL_NAME, config.INFERENCE_BACKEND)
+    # Bind before loading the model, so a second server fails right away.
+    server = ModelServer(args.socket, engine)
+    engine.start()
+    stopped = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stopped.set())
+
+    thread = threading.Thread(target=server.serve_forever, name="model-server", daemon=True)
+    thread.start()
+    logger.info("Model server listening on %s", args.socket)
+    try:
+        stopped.wait()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
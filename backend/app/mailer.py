@@ -0,0 +1,308 @@
+"""Outbound email: a persistent queue in ``outbound_emails`` and a background
+dispatcher that delivers it over reused SMTP connections.
+
+Routes ``enqueue`` messages in their own transaction and call
+``dispatcher.wake()`` after committing, so a request never waits on the mail
+server. Every API worker may run a dispatcher: rows are claimed with a
+conditional UPDATE, so only one of them sends a given message, and a claim
+expires after CLAIM_SECONDS so the messages of a crashed worker go back to
+the queue.
+"""
+import asyncio
+import logging
+import random
+import smtplib
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from email.mime.text import MIMEText
+from typing import Callable, List, Optional
+
+from sqlalchemy import and_, select, update
+
+from app.core import config
+from app.database import AsyncSessionLocal
+from app.db_models import OutboundEmail
+from app.metrics import EMAILS, SMTP_CONNECTIONS
+
+logger = logging.getLogger(__name__)
+
+# A claimed batch must be sent before its claim runs out.
+CLAIM_SECONDS = max(60.0, config.SMTP_TIMEOUT * (config.MAIL_BATCH_SIZE + 2))
+
+
+def enqueue(db, recipient: str, subject: str, body: str) -> OutboundEmail:
+    """Adds a message to the queue; it is sent once the caller commits."""
+    email = OutboundEmail(
+        id=uuid.uuid4(),
+        recipient=recipient,
+        subject=subject,
+        body=body,
+        status="pending",
+        attempts=0,
+        next_attempt_at=datetime.utcnow(),
+    )
+    db.add(email)
+    return email
+
+
+def smtp_connect() -> smtplib.SMTP:
+    connection = smtplib.SMTP(config.SMTP_HOST, config.SMTP_PORT, timeout=config.SMTP_TIMEOUT)
+    try:
+        if config.SMTP_STARTTLS:
+            connection.starttls()
+        if config.SMTP_USERNAME:
+            connection.login(config.SMTP_USERNAME, config.SMTP_PASSWORD)
+    except BaseException:
+        _close(connection)
+        raise
+    return connection
+
+
+def _close(connection: smtplib.SMTP):
+    try:
+        connection.quit()
+    except (smtplib.SMTPException, OSError):
+        connection.close()
+
+
+def is_permanent(error: Exception) -> bool:
+    """5xx replies (unknown mailbox, rejected content) will not succeed on retry."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code >= 500
+
+
+class SMTPPool:
+    """Keeps up to ``size`` authenticated SMTP connections open for reuse.
+
+    ``connect`` opens one connection; pass a different factory to deliver
+    somewhere else, e.g. to the in-process server of scripts/fake_smtp.py.
+    """
+
+    def __init__(self, connect: Callable[[], smtplib.SMTP] = smtp_connect,
+                 size: int = config.SMTP_POOL_SIZE, idle_seconds: float = config.SMTP_IDLE_SECONDS):
+        self.connect = connect
+        self.size = size
+        self.idle_seconds = idle_seconds
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _acquire(self) -> smtplib.SMTP:
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                connection, last_used = self._idle.pop()
+            if time.monotonic() - last_used > self.idle_seconds:
+                _close(connection)
+                continue
+            # The server may have dropped the connection while it sat idle.
+            try:
+                if connection.noop()[0] == 250:
+                    SMTP_CONNECTIONS.inc("reused")
+                    return connection
+            except (smtplib.SMTPException, OSError):
+                pass
+            connection.close()
+        connection = self.connect()
+        SMTP_CONNECTIONS.inc("opened")
+        return connection
+
+    def _release(self, connection: smtplib.SMTP):
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append((connection, time.monotonic()))
+                return
+        _close(connection)
+
+    def send(self, messages: List[MIMEText]) -> List[Optional[Exception]]:
+        """Sends the messages over one connection; returns the error of each (None when sent)."""
+        errors = []
+        connection = None
+        for message in messages:
+            if connection is None:
+                try:
+                    connection = self._acquire()
+                except Exception as e:
+                    # Server unreachable: the rest of the batch would fail the same way.
+                    return errors + [e] * (len(messages) - len(errors))
+            try:
+                connection.send_message(message)
+                errors.append(None)
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError) as e:
+                # Rejected message; the connection itself is still usable.
+                errors.append(e)
+            except Exception as e:
+                # Anything else is recorded against this message too, so the
+                # dispatcher can count the attempt; the connection may be left
+                # mid-command, so it is not reused.
+                errors.append(e)
+                connection.close()
+                connection = None
+        if connection is not None:
+            self._release(connection)
+        return errors
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection, _ in idle:
+            _close(connection)
+
+
+def retry_delay(attempts: int) -> float:
+    delay = min(config.MAIL_RETRY_MAX_SECONDS, config.MAIL_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+    return delay * random.uniform(0.75, 1.0)
+
+
+def _message(email: OutboundEmail) -> MIMEText:
+    message = MIMEText(email.body)
+    message["Subject"] = email.subject
+    message["From"] = config.MAIL_FROM
+    message["To"] = email.recipient
+    return message
+
+
+class MailDispatcher:
+    """Delivers due messages in batches from a background task on the event loop.
+
+    SMTP calls are blocking, so each batch is split across the pool's
+    connections and sent on a small thread pool.
+    """
+
+    def __init__(self, pool: Optional[SMTPPool] = None, session_factory=AsyncSessionLocal,
+                 batch_size: int = config.MAIL_BATCH_SIZE, poll_seconds: float = config.MAIL_POLL_SECONDS,
+                 max_attempts: int = config.MAIL_MAX_ATTEMPTS):
+        self.pool = pool or SMTPPool()
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self.max_attempts = max_attempts
+        self._wake = None
+        self._task = None
+        self._executor = None
+
+    def start(self):
+        if self._task is not None:
+            return
+        self._wake = asyncio.Event()
+        self._executor = ThreadPoolExecutor(max_workers=self.pool.size, thread_name_prefix="smtp")
+        self._task = asyncio.create_task(self._run())
+
+    def wake(self):
+        """Checks the queue now instead of at the next poll."""
+        if self._wake is not None:
+            self._wake.set()
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        await asyncio.to_thread(self._executor.shutdown, wait=True)
+        self.pool.close()
+        self._task = self._executor = self._wake = None
+
+    async def _run(self):
+        while True:
+            try:
+                claimed = await self.dispatch_once()
+            except Exception:
+                logger.exception("Mail dispatch failed")
+                claimed = 0
+            if claimed < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+
+    async def dispatch_once(self) -> int:
+        """Claims and sends one batch of due messages; returns how many were claimed."""
+        token = uuid.uuid4().hex
+        emails = await self._claim(token)
+        if not emails:
+            return 0
+
+        # A message that cannot even be built fails like a rejected one, so its
+        # attempts still advance towards max_attempts.
+        outcomes = []
+        messages = {}
+        for email in emails:
+            try:
+                messages[email.id] = _message(email)
+            except Exception as e:
+                outcomes.append((email, e))
+        sendable = [email for email in emails if email.id in messages]
+
+        chunks = [sendable[i::self.pool.size] for i in range(min(self.pool.size, len(sendable)))]
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(*(
+            loop.run_in_executor(self._executor, self.pool.send, [messages[email.id] for email in chunk])
+            for chunk in chunks
+        ))
+        outcomes.extend(
+            (email, error)
+            for chunk, errors in zip(chunks, results)
+            for email, error in zip(chunk, errors)
+        )
+        await self._record(token, outcomes)
+        return len(emails)
+
+    async def _claim(self, token: str) -> List[OutboundEmail]:
+        now = datetime.utcnow()
+        due = and_(OutboundEmail.status.in_(("pending", "sending")), OutboundEmail.next_attempt_at <= now)
+        async with self.session_factory() as db:
+            ids = (await db.execute(
+                select(OutboundEmail.id).where(due).order_by(OutboundEmail.next_attempt_at).limit(self.batch_size)
+            )).scalars().all()
+            if not ids:
+                return []
+            await db.execute(
+                update(OutboundEmail)
+                .where(OutboundEmail.id.in_(ids), due)
+                .values(status="sending", claim_token=token,
+                        next_attempt_at=now + timedelta(seconds=CLAIM_SECONDS))
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+            # Another dispatcher may have claimed some of them first.
+            return (await db.execute(
+                select(OutboundEmail).where(OutboundEmail.id.in_(ids), OutboundEmail.claim_token == token)
+            )).scalars().all()
+
+    async def _record(self, token: str, outcomes):
+        now = datetime.utcnow()
+        async with self.session_factory() as db:
+            for email, error in outcomes:
+                attempts = email.attempts + 1
+                if error is None:
+                    values = {"status": "sent", "sent_at": now, "last_error": None}
+                    EMAILS.inc("sent")
+                elif attempts >= self.max_attempts or is_permanent(error):
+                    values = {"status": "failed", "last_error": repr(error)}
+                    EMAILS.inc("failed")
+                    logger.warning("Giving up on email %s to %s: %r", email.id, email.recipient, error)
+                else:
+                    values = {
+                        "status": "pending",
+                        "next_attempt_at": now + timedelta(seconds=retry_delay(attempts)),
+                        "last_error": repr(error),
+                    }
+                    EMAILS.inc("retried")
+                await db.execute(
+                    update(OutboundEmail)
+                    .where(OutboundEmail.id == email.id, OutboundEmail.claim_token == token)
+                    .values(attempts=attempts, claim_token=None, **values)
+                    .execution_options(synchronize_session=False)
+                )
+            await db.commit()
+
+
+dispatcher = MailDispatcher()
@@ -1,21 +1,129 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from app.api import users, analysis
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from app.api import users, analysis, analytics
+from app.core import config
+from app.core.admission import Overloaded
+from app.core.executor import admission, shutdown_executor
+from app.core.security import HasherBusy, hasher_stats, reset_token_secret, shutdown_hasher
+from app.database import async_engine, pool_counters, pool_stats
+from app.inference.engine import ModelNotReady
+from app.mailer import dispatcher
+from app.metrics import Gauge, MetricsMiddleware, render
+from app.model import engine, prediction_cache
+from app.profiling import ProfilingMiddleware
+from app.responses import FastJSONResponse
+from app.schemas import HasherStats, ModelStatus, PoolStats, StatusOut
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    reset_token_secret()
+    if config.MODEL_EAGER_LOAD:
+        engine.start()
+    if config.MAIL_DISPATCHER_ENABLED:
+        dispatcher.start()
+    yield
+    await dispatcher.stop()
+    shutdown_executor()
+    shutdown_hasher()
+    await async_engine.dispose()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
+app.add_middleware(MetricsMiddleware)
+# Not installed at all unless enabled, so unprofiled deployments pay nothing.
+if config.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
 
 # Include routers
 app.include_router(users.router, prefix="/users", tags=["Users"])
 app.include_router(analysis.router, prefix="/api", tags=["Analysis"])
+app.include_router(analytics.router, prefix="/api", tags=["Analytics"])
+
+
+@app.exception_handler(ModelNotReady)
+async def model_not_ready_handler(request: Request, exc: ModelNotReady):
+    return FastJSONResponse(
+        status_code=503,
+        content={"detail": str(exc), "state": exc.state},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(HasherBusy)
+async def hasher_busy_handler(request: Request, exc: HasherBusy):
+    return FastJSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    return FastJSONResponse(
+        status_code=503,
+        content={"detail": str(exc), "lane": exc.lane},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(PoolTimeoutError)
+async def pool_timeout_handler(request: Request, exc: PoolTimeoutError):
+    pool_counters["timeouts"] += 1
+    return FastJSONResponse(
+        status_code=503,
+        content={"detail": "Database is busy, try again shortly."},
+        headers={"Retry-After": "1"},
+    )
 
 
-@app.get("/")
+@app.get("/", response_model=StatusOut)
 def read_root():
     return {"status": "running"}
+
+
+@app.get("/ready", response_model=ModelStatus)
+def readiness():
+    status = engine.status()
+    return FastJSONResponse(status_code=200 if status["state"] == "ready" else 503, content=status)
+
+
+@app.get("/health/db", response_model=PoolStats, response_model_exclude_none=True)
+def database_health():
+    return pool_stats()
+
+
+@app.get("/health/auth", response_model=HasherStats)
+def auth_health():
+    return hasher_stats()
+
+
+def _numeric(stats: dict) -> dict:
+    return {(name,): value for name, value in stats.items() if isinstance(value, (int, float))}
+
+
+Gauge("model_ready", "1 once the model has loaded and warmed up.", lambda: int(engine.state == "ready"))
+Gauge("db_pool", "Async database pool state and counters.", lambda: _numeric(pool_stats()), ["stat"])
+Gauge("prediction_cache", "Prediction cache size and hit/miss counters.",
+      lambda: _numeric(prediction_cache.stats()), ["stat"])
+Gauge("admission", "Analyze admission control: slots in flight, queued per lane, service time.",
+      lambda: _numeric(admission.stats()), ["stat"])
+Gauge("password_hasher", "bcrypt process pool queue and counters.", lambda: _numeric(hasher_stats()), ["stat"])
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
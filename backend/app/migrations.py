@@ -0,0 +1,188 @@
+"""Versioned, forward-only schema migrations.
+
+Each migration has an integer version and runs once, in its own transaction;
+applied versions are recorded in the ``schema_migrations`` table. Migrations
+must be idempotent (``IF NOT EXISTS`` / ``checkfirst``) because a fresh
+database created with ``Base.metadata.create_all`` already has the current
+schema and only needs to be stamped.
+
+Apply pending migrations with ``python -m scripts.migrate``.
+"""
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, List, NamedTuple
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import CreateTable
+
+migrations_metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations",
+    migrations_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    upgrade: Callable[[Connection], None]
+
+
+MIGRATIONS: List[Migration] = []
+
+
+def migration(version: int, description: str):
+    def register(upgrade):
+        MIGRATIONS.append(Migration(version, description, upgrade))
+        MIGRATIONS.sort(key=lambda m: m.version)
+        return upgrade
+    return register
+
+
+def _create_indexes(conn: Connection, indexes):
+    for name, table, columns in indexes:
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"))
+
+
+@migration(1, "Add indexes for diary, writing and catalog lookups")
+def add_hot_path_indexes(conn: Connection):
+    _create_indexes(conn, [
+        ("ix_diary_entries_user_id_date", "diary_entries", ["user_id", "date", "id"]),
+        ("ix_writing_entries_user_id_date", "writing_entries", ["user_id", "date", "id"]),
+        ("ix_tips_emotion_id_language", "tips", ["emotion_id", "language"]),
+        ("ix_breathing_exercises_emotion_id_language", "breathing_exercises", ["emotion_id", "language"]),
+    ])
+
+
+@migration(2, "Store each analysed text once in analyses, backfilled from diary_entries")
+def add_analyses(conn: Connection):
+    from app.db_models import Analysis, DiaryEntry
+
+    Analysis.__table__.create(conn, checkfirst=True)
+    if conn.execute(select(Analysis.id).limit(1)).first():
+        return
+
+    # analyze_text used to write one diary_entries row per top emotion, with
+    # datetime.now() taken per row; rows for the same user and text written
+    # within a second of each other belong to the same submission, in rank order.
+    legacy = conn.execute(
+        select(DiaryEntry.user_id, DiaryEntry.text, DiaryEntry.emotion, DiaryEntry.date)
+        .order_by(DiaryEntry.user_id, DiaryEntry.text, DiaryEntry.date)
+    )
+    batch = []
+    current = None
+    for user_id, text_, emotion, date in legacy:
+        if (current is None or current["user_id"] != user_id or current["text"] != text_
+                or date - current["date"] > timedelta(seconds=1)):
+            current = {
+                "id": uuid.uuid4(),
+                "user_id": user_id,
+                "text": text_,
+                "scores": None,
+                "top_emotions": [],
+                "language": None,
+                "date": date,
+            }
+            batch.append(current)
+        current["top_emotions"].append(emotion)
+        if len(batch) > 1000:
+            conn.execute(Analysis.__table__.insert(), batch[:-1])
+            batch = batch[-1:]
+    if batch:
+        conn.execute(Analysis.__table__.insert(), batch)
+
+
+@migration(3, "Make tip and breathing exercise titles unique per emotion and language")
+def add_catalog_natural_keys(conn: Connection):
+    for table in ("tips", "breathing_exercises"):
+        # Earlier seeding runs could insert the same title twice; keep one copy.
+        conn.execute(text(
+            f"DELETE FROM {table} WHERE CAST(id AS TEXT) NOT IN ("
+            f"SELECT MIN(CAST(id AS TEXT)) FROM {table} GROUP BY emotion_id, language, title)"
+        ))
+        conn.execute(text(
+            f"CREATE UNIQUE INDEX IF NOT EXISTS uq_{table}_emotion_id_language_title "
+            f"ON {table} (emotion_id, language, title)"
+        ))
+
+
+@migration(4, "Add per-user daily and weekly mood rollups, backfilled from analyses")
+def add_mood_rollups(conn: Connection):
+    from app import rollups
+    from app.db_models import MoodRollup
+
+    MoodRollup.__table__.create(conn, checkfirst=True)
+    if conn.execute(select(MoodRollup.user_id).limit(1)).first():
+        return
+    rollups.rebuild(conn)
+
+
+@migration(5, "Add the outbound email queue")
+def add_outbound_emails(conn: Connection):
+    from app.db_models import OutboundEmail
+
+    OutboundEmail.__table__.create(conn, checkfirst=True)
+
+
+@migration(6, "Allow users without a password hash or sex (Google sign-in)")
+def make_google_user_columns_nullable(conn: Connection):
+    from app.db_models import User
+
+    columns = ("password_hash", "sex")
+    if conn.dialect.name != "sqlite":
+        for column in columns:
+            conn.execute(text(f"ALTER TABLE users ALTER COLUMN {column} DROP NOT NULL"))
+        return
+
+    # SQLite cannot drop a NOT NULL constraint in place: rebuild the table from
+    # the current model and copy the rows over.
+    existing = {row[1]: row[3] for row in conn.execute(text("PRAGMA table_info(users)"))}
+    if not any(existing.get(column) for column in columns):
+        return
+    ddl = str(CreateTable(User.__table__).compile(conn)).replace("CREATE TABLE users ", "CREATE TABLE users_new ", 1)
+    conn.execute(text(ddl))
+    copied = ", ".join(column.name for column in User.__table__.columns if column.name in existing)
+    conn.execute(text(f"INSERT INTO users_new ({copied}) SELECT {copied} FROM users"))
+    conn.execute(text("DROP TABLE users"))
+    conn.execute(text("ALTER TABLE users_new RENAME TO users"))
+    for index in User.__table__.indexes:
+        index.create(conn, checkfirst=True)
+
+
+@migration(7, "Index catalog updated_at columns for the catalog version check")
+def add_catalog_updated_at_indexes(conn: Connection):
+    _create_indexes(conn, [
+        ("ix_emotions_updated_at", "emotions", ["updated_at"]),
+        ("ix_tips_updated_at", "tips", ["updated_at"]),
+        ("ix_breathing_exercises_updated_at", "breathing_exercises", ["updated_at"]),
+    ])
+
+
+def applied_versions(engine: Engine) -> set:
+    migrations_metadata.create_all(bind=engine)
+    with engine.connect() as conn:
+        return set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+
+def pending_migrations(engine: Engine) -> List[Migration]:
+    applied = applied_versions(engine)
+    return [m for m in MIGRATIONS if m.version not in applied]
+
+
+def upgrade(engine: Engine, log=print) -> List[Migration]:
+    pending = pending_migrations(engine)
+    for m in pending:
+        with engine.begin() as conn:
+            m.upgrade(conn)
+            conn.execute(schema_migrations.insert().values(
+                version=m.version,
+                description=m.description,
+                applied_at=datetime.utcnow(),
+            ))
+        log(f" Applied migration {m.version}: {m.description}")
+    return pending
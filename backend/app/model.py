@@ -1,13 +1,31 @@
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-import torch
-import torch.nn.functional as F
-
-from app.db_models import Tip, BreathingExercise, Emotion
-
-MODEL_NAME = "./model"
-
-tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-model = AutoModelForSequenceClassification.from_pretrained(MODEL_NAME)
+import struct
+from typing import List, NamedTuple
+
+from app.core import config
+from app.catalog import catalog
+from app.core.executor import run_in_executor
+from app.inference.cache import FileCacheBackend, PredictionCache, cache_key
+from app.inference.client import RemoteEngine
+from app.inference.engine import ModelEngine
+from app.metrics import STAGE_SECONDS
+
+MODEL_NAME = config.MODEL_NAME
+
+# Loading is deferred: app.main starts it on a background thread at startup
+# and /ready reports progress; predict_emotions waits for it if needed. With a
+# model server configured, scoring goes over its socket instead.
+if config.MODEL_SERVER_SOCKET:
+    engine = RemoteEngine(config.MODEL_SERVER_SOCKET)
+else:
+    engine = ModelEngine(MODEL_NAME, config.INFERENCE_BACKEND)
+
+prediction_cache = PredictionCache(
+    config.PREDICTION_CACHE_SIZE,
+    config.PREDICTION_CACHE_TTL,
+    FileCacheBackend(
+        config.PREDICTION_CACHE_DIR, config.PREDICTION_CACHE_TTL, config.PREDICTION_CACHE_DIR_MAX_ENTRIES
+    ) if config.PREDICTION_CACHE_DIR else None,
+)
 
 LABELS = [
     "admiration", "amusement", "anger", "annoyance", "approval", "caring",
@@ -17,72 +35,102 @@ LABELS = [
     "remorse", "sadness", "surprise", "neutral"
 ]
 
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Stored score vectors: the 28 probabilities in LABELS order as little-endian
+# float16 (56 bytes per analysis).
+SCORES_FORMAT = f"<{len(LABELS)}e"
+
+
+def pack_scores(probs) -> bytes:
+    return struct.pack(SCORES_FORMAT, *probs)
+
+
+def unpack_scores(data: bytes) -> List[float]:
+    return list(struct.unpack(SCORES_FORMAT, data))
+
+
+class Prediction(NamedTuple):
+    scores: List[float]
+    top_emotions: List[str]
+    recommendations: List[dict]
+
+
+def score_text(text: str):
+    key = cache_key(text, engine.model_version)
+    probs = prediction_cache.get(key)
+    if probs is None:
+        probs = engine.score(text)
+        prediction_cache.put(key, probs)
+    return probs
 
-def predict_emotions(text: str, db: Session, language: str = 'uk'):
-    inputs = tokenizer(text, return_tensors="pt", truncation=True)
-    with torch.no_grad():
-        outputs = model(**inputs)
-        probs = F.softmax(outputs.logits, dim=1).squeeze()
 
-    scores = {LABELS[i]: probs[i].item() for i in range(len(LABELS))}
-    sorted_emotions = sorted(scores.items(), key=lambda x: x[1], reverse=True)
+def score_texts(texts):
+    # Cached texts are answered directly; the rest (deduplicated) go through
+    # the engine's micro-batcher in chunks of at most BATCH_MAX_SIZE.
+    keys = [cache_key(text, engine.model_version) for text in texts]
+    found = {}
+    pending = {}
+    for key, text in zip(keys, texts):
+        if key in found or key in pending:
+            continue
+        probs = prediction_cache.get(key)
+        if probs is None:
+            pending[key] = text
+        else:
+            found[key] = probs
 
-    print("\n Detected Emotion Scores:")
-    for emotion, score in sorted_emotions:
-        print(f"{emotion}: {score:.4f}")
+    pending_keys = list(pending)
+    for i in range(0, len(pending_keys), config.BATCH_MAX_SIZE):
+        chunk = pending_keys[i:i + config.BATCH_MAX_SIZE]
+        for key, probs in zip(chunk, engine.score_batch([pending[key] for key in chunk])):
+            prediction_cache.put(key, probs)
+            found[key] = probs
 
-    top_emotions = [emotion for emotion, _ in sorted_emotions[:3]]
-    emotions = db.query(Emotion).filter(Emotion.name.in_(top_emotions)).all()
-    emotions.sort(key=lambda x: top_emotions.index(x.name))
+    return [found[key] for key in keys]
 
+
+def sort_emotions(probs):
+    scores = {LABELS[i]: probs[i] for i in range(len(LABELS))}
+    return sorted(scores.items(), key=lambda x: x[1], reverse=True)
+
+
+def top_emotions_of(probs, k: int = 3) -> List[str]:
+    with STAGE_SECONDS.time("topk"):
+        return [emotion for emotion, _ in sort_emotions(probs)[:k]]
+
+
+def predict(text: str, catalog_entries, language: str = 'uk') -> Prediction:
+    probs = score_text(text)
+    top_emotions = top_emotions_of(probs)
+    results = build_recommendations(top_emotions, catalog_entries, language)
+    return Prediction(probs, top_emotions, results)
+
+
+async def predict_emotions(text: str, db: AsyncSession, language: str = 'uk'):
+    entries = await catalog.entries_async(db)
+    return (await run_in_executor(predict, text, entries, language)).recommendations
+
+
+def predict_batch(texts, catalog_entries, language: str = 'uk') -> List[Prediction]:
+    predictions = []
+    for probs in score_texts(texts):
+        top_emotions = top_emotions_of(probs)
+        predictions.append(Prediction(
+            probs, top_emotions, build_recommendations(top_emotions, catalog_entries, language)
+        ))
+    return predictions
+
+
+def build_recommendations(top_emotions, catalog_entries, language: str = 'uk'):
+    # catalog_entries is the in-memory catalog mapping (see app.catalog), so
+    # recommendations need no database reads.
     results = []
-    for emotion in emotions:
-        tips = db.query(Tip).filter(
-            Tip.emotion_id == emotion.id,
-            Tip.language == language
-        ).all()
-
-        if tips:
-            tips_data = [{
-                "id": str(t.id),
-                "title": t.title,
-                "description": t.description,
-                "type": t.type.value
-            } for t in tips]
+    for emotion in top_emotions:
+        data = catalog_entries.get((emotion, language))
+        if data:
             results.append({
-                "emotion": emotion.name,
-                "data": tips_data
+                "emotion": emotion,
+                "data": data
             })
-
-        if not tips:
-            breathing_exercises = db.query(BreathingExercise).filter(
-                BreathingExercise.emotion_id == emotion.id,
-                BreathingExercise.language == language
-            ).all()
-
-            if breathing_exercises:
-                breathing_data = [{
-                    "id": str(b.id),
-                    "title": b.title,
-                    "description": b.description,
-                    "inhale_duration": b.inhale_duration,
-                    "hold_duration": b.hold_duration,
-                    "exhale_duration": b.exhale_duration,
-                    "cycles": b.cycles,
-                    "type": "breathing_exercise"  # <-- type is defined here for the card to understand
-                } for b in breathing_exercises]
-
-                results.append({
-                    "emotion": emotion.name,
-                    "data": breathing_data
-                })
-
-    results.sort(key=lambda x: top_emotions.index(x["emotion"]))
-
-    print("\n Final Sorted Results:")
-    for item in results:
-        print(f"{item['emotion']}: {len(item['data'])} items")
-
-    print(results)
     return results
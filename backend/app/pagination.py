@@ -0,0 +1,96 @@
+import base64
+from datetime import datetime
+from typing import Callable, Optional, Tuple
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import config
+from app.database import AsyncSessionLocal
+from app.responses import dumps
+
+STREAM_CHUNK_SIZE = 500
+
+
+def encode_cursor(date: datetime, row_id) -> str:
+    raw = f"{date.isoformat()}|{row_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        date, row_id = raw.split("|", 1)
+        return datetime.fromisoformat(date), row_id
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset(query: Select, date_column, id_column, cursor: Optional[str], id_type=str) -> Select:
+    """Newest-first ordering on (date, id), resuming strictly after ``cursor``.
+
+    Unlike OFFSET, the database seeks straight to the cursor position, so a
+    page costs the same no matter how deep into the history it is.
+    """
+    if cursor:
+        date, row_id = decode_cursor(cursor)
+        try:
+            row_id = id_type(row_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.where(tuple_(date_column, id_column) < tuple_(date, row_id))
+    return query.order_by(date_column.desc(), id_column.desc())
+
+
+def page_limit(limit: Optional[int], cursor: Optional[str]) -> Optional[int]:
+    """Paging is opt-in: a request with neither ``limit`` nor ``cursor`` gets
+    the whole listing (None), one with only a cursor gets PAGE_SIZE rows."""
+    if limit is None and cursor:
+        return config.PAGE_SIZE
+    return limit
+
+
+async def fetch_page(db: AsyncSession, query: Select, limit: Optional[int]):
+    """Returns (rows, next_cursor); rows must expose ``date`` and ``id``.
+
+    Without a ``limit`` every row is returned and there is no next cursor.
+    """
+    if limit is None:
+        return (await db.execute(query)).all(), None
+    rows = (await db.execute(query.limit(limit + 1))).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].date, rows[-1].id)
+
+
+def stream_rows(query: Select, serialize: Callable, fmt: str) -> StreamingResponse:
+    """Streams every row of the query as NDJSON or as one JSON array.
+
+    ``serialize`` maps one row to a list of output items. Rows are fetched in
+    chunks through a server-side cursor, so memory stays flat however long the
+    history is. The generator owns its own session because it keeps running
+    after the route function has returned.
+    """
+
+    async def generate():
+        async with AsyncSessionLocal() as db:
+            rows = await db.stream(query.execution_options(yield_per=STREAM_CHUNK_SIZE))
+            if fmt == "ndjson":
+                async for row in rows:
+                    for item in serialize(row):
+                        yield dumps(item) + b"\n"
+                return
+
+            yield b"["
+            separator = b""
+            async for row in rows:
+                for item in serialize(row):
+                    yield separator + dumps(item)
+                    separator = b","
+            yield b"]"
+
+    media_type = "application/x-ndjson" if fmt == "ndjson" else "application/json"
+    return StreamingResponse(generate(), media_type=media_type)
@@ -0,0 +1,150 @@
+"""On-demand profiling of individual requests.
+
+Installed only when PROFILING_ENABLED is set. A request to one of
+PROFILING_PATHS is profiled when it carries ``X-Profile: <PROFILING_TOKEN>``
+or is picked by PROFILING_SAMPLE_RATE. With pyinstrument installed it is a
+sampling profile following the request across awaits, saved as an HTML
+flame graph; otherwise cProfile writes a ``.pstats`` file (open it with
+``python -m pstats`` or snakeviz). Files are named after the time, route and
+request id (``X-Request-ID`` when the client sends one), and only the newest
+PROFILING_MAX_FILES are kept. Profiled responses echo the id back in
+``X-Profile-Request-Id``.
+
+Both profilers only see the event loop thread: work handed to the model or
+password-hashing executors shows up as the await that waited for it. cProfile
+also records whatever other requests the loop ran in the meantime.
+"""
+import asyncio
+import logging
+import random
+import re
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from app.core import config
+from app.metrics import route_label
+
+try:
+    import pyinstrument
+except ImportError:  # pragma: no cover - optional, falls back to cProfile
+    pyinstrument = None
+
+logger = logging.getLogger(__name__)
+
+
+PROFILE_SUFFIXES = (".html", ".pstats")
+
+
+class _PyinstrumentProfile:
+    suffix = ".html"
+
+    def __init__(self):
+        self.profiler = pyinstrument.Profiler(interval=config.PROFILING_INTERVAL, async_mode="enabled")
+
+    def start(self):
+        self.profiler.start()
+
+    def stop(self):
+        self.profiler.stop()
+
+    def write(self, path: Path):
+        path.write_text(self.profiler.output_html(), encoding="utf-8")
+
+
+class _CProfile:
+    suffix = ".pstats"
+
+    def __init__(self):
+        import cProfile
+
+        self.profiler = cProfile.Profile()
+
+    def start(self):
+        self.profiler.enable()
+
+    def stop(self):
+        self.profiler.disable()
+
+    def write(self, path: Path):
+        self.profiler.dump_stats(str(path))
+
+
+def _slug(value: str) -> str:
+    return re.sub(r"[^A-Za-z0-9]+", "_", value).strip("_")[:60] or "root"
+
+
+def _prune(directory: Path, keep: int):
+    profiles = sorted(
+        (path for path in directory.iterdir() if path.suffix in PROFILE_SUFFIXES),
+        key=lambda path: path.stat().st_mtime,
+    )
+    for path in profiles[:max(0, len(profiles) - keep)]:
+        path.unlink(missing_ok=True)
+
+
+def save_profile(profile, directory: Path, method: str, route: str, request_id: str) -> Path:
+    directory.mkdir(parents=True, exist_ok=True)
+    stamp = time.strftime("%Y%m%dT%H%M%S")
+    path = directory / f"{stamp}-{method}-{_slug(route)}-{_slug(request_id)}{profile.suffix}"
+    profile.write(path)
+    _prune(directory, config.PROFILING_MAX_FILES)
+    return path
+
+
+class ProfilingMiddleware:
+    """Profiles requests that ask for it (or are sampled) and saves the result."""
+
+    def __init__(self, app):
+        self.app = app
+        self.paths = tuple(path for path in config.PROFILING_PATHS.split(",") if path)
+        self.token = config.PROFILING_TOKEN.encode("latin-1")
+        self.directory = Path(config.PROFILING_DIR)
+        # Only one profiler can be attached to the event loop thread at a time;
+        # a request triggered while another is being profiled runs unprofiled.
+        self._active = threading.Lock()
+
+    def _triggered(self, scope) -> bool:
+        if not scope["path"].startswith(self.paths):
+            return False
+        if self.token:
+            for name, value in scope["headers"]:
+                if name == b"x-profile":
+                    return value == self.token
+        return config.PROFILING_SAMPLE_RATE > 0 and random.random() < config.PROFILING_SAMPLE_RATE
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._triggered(scope) or not self._active.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        request_id = next(
+            (value.decode("latin-1") for name, value in scope["headers"] if name == b"x-request-id"),
+            uuid.uuid4().hex,
+        )
+        try:
+            profile = _PyinstrumentProfile() if pyinstrument is not None else _CProfile()
+
+            async def send_with_id(message):
+                if message["type"] == "http.response.start":
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-profile-request-id", request_id.encode("latin-1")))
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            profile.start()
+            try:
+                await self.app(scope, receive, send_with_id)
+            finally:
+                profile.stop()
+                route = route_label(scope)
+                try:
+                    path = await asyncio.to_thread(
+                        save_profile, profile, self.directory, scope["method"], route, request_id
+                    )
+                    logger.info("Profiled %s %s (%s) -> %s", scope["method"], route, request_id, path)
+                except OSError:
+                    logger.exception("Could not save request profile")
+        finally:
+            self._active.release()
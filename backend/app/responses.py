@@ -0,0 +1,66 @@
+"""JSON encoding for responses the routes build themselves.
+
+Routes that declare a ``response_model`` are encoded by FastAPI straight to
+bytes through pydantic-core. The hot analysis routes skip that and assemble
+their body here instead: orjson for the per-request parts, with the
+recommendation payloads spliced in from encodings made once per catalog load.
+"""
+import json
+from typing import Iterable, List
+
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson (or compact stdlib JSON without it)."""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+class EncodedList(list):
+    """A list that also carries its JSON encoding, made once up front.
+
+    Used for catalog payloads, which are shared and never mutated.
+    """
+
+    __slots__ = ("json",)
+
+    def __init__(self, items: Iterable = ()):
+        super().__init__(items)
+        self.json = dumps(list(self))
+
+
+def _encoded(value) -> bytes:
+    return value.json if isinstance(value, EncodedList) else dumps(value)
+
+
+def encode_recommendations(recommendations: List[dict]) -> bytes:
+    """``[{"emotion": ..., "data": [...]}, ...]`` with pre-encoded ``data`` spliced in."""
+    return b"[" + b",".join(
+        b'{"emotion":' + dumps(item["emotion"]) + b',"data":' + _encoded(item["data"]) + b"}"
+        for item in recommendations
+    ) + b"]"
+
+
+def analysis_response(recommendations: List[dict]) -> Response:
+    body = b'{"emotions":' + encode_recommendations(recommendations) + b"}"
+    return Response(body, media_type="application/json")
+
+
+def batch_analysis_response(items: List[List[dict]]) -> Response:
+    body = b'{"items":[' + b",".join(
+        b'{"emotions":' + encode_recommendations(recommendations) + b"}" for recommendations in items
+    ) + b"]}"
+    return Response(body, media_type="application/json")
@@ -0,0 +1,93 @@
+"""Per-user daily and weekly emotion counts kept in ``mood_rollups``.
+
+The analyze routes add to the rollups in the same transaction that stores the
+analysis, with an atomic ``count = count + n`` upsert, so concurrent writes
+for the same user and day never lose an increment. ``rebuild`` recomputes the
+rows from ``analyses`` for bulk loads that bypass the routes (the migration
+backfill and the seeding script).
+"""
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db_models import Analysis, MoodRollup
+
+PERIOD_DAYS = {"day": 1, "week": 7}
+PERIODS = tuple(PERIOD_DAYS)
+REBUILD_CHUNK_SIZE = 1000
+
+INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def period_start(period: str, day: date) -> date:
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+def rollup_counts(user_id, analyses: Iterable[Tuple[datetime, list]]) -> Dict[tuple, int]:
+    """Maps (user_id, period, period_start, emotion) to the number of analyses
+    that had the emotion among their top emotions."""
+    counts = Counter()
+    for analysis_date, top_emotions in analyses:
+        for period in PERIODS:
+            start = period_start(period, analysis_date.date())
+            for emotion in set(top_emotions or ()):
+                counts[(user_id, period, start, emotion)] += 1
+    return counts
+
+
+def _rows(counts: Dict[tuple, int]) -> list:
+    return [
+        {"user_id": user_id, "period": period, "period_start": start, "emotion": emotion, "count": count}
+        for (user_id, period, start, emotion), count in counts.items()
+    ]
+
+
+def _increment_statement(dialect: str):
+    try:
+        insert = INSERTS[dialect]
+    except KeyError:
+        raise RuntimeError(f"Mood rollups do not support the '{dialect}' dialect")
+    statement = insert(MoodRollup)
+    return statement.on_conflict_do_update(
+        index_elements=[MoodRollup.user_id, MoodRollup.period, MoodRollup.period_start, MoodRollup.emotion],
+        set_={"count": MoodRollup.count + statement.excluded["count"]},
+    )
+
+
+async def increment(db: AsyncSession, user_id, analyses: Iterable[Tuple[datetime, list]]):
+    """Adds new analyses to the rollups; the caller commits."""
+    rows = _rows(rollup_counts(user_id, analyses))
+    if rows:
+        await db.execute(_increment_statement(db.get_bind().dialect.name), rows)
+
+
+def rebuild(conn: Connection, user_ids: Optional[Iterable] = None):
+    """Recomputes the rollups of ``user_ids`` (all users when None) from analyses."""
+    query = select(Analysis.user_id, Analysis.date, Analysis.top_emotions)
+    clear = delete(MoodRollup)
+    if user_ids is not None:
+        user_ids = list(user_ids)
+        if not user_ids:
+            return
+        query = query.where(Analysis.user_id.in_(user_ids))
+        clear = clear.where(MoodRollup.user_id.in_(user_ids))
+    conn.execute(clear)
+
+    # The counts are bounded by users x periods x emotions, not by history.
+    counts = Counter()
+    analyses = conn.execute(query.execution_options(yield_per=REBUILD_CHUNK_SIZE))
+    for user_id, analysis_date, top_emotions in analyses:
+        counts.update(rollup_counts(user_id, [(analysis_date, top_emotions)]))
+    rows = _rows(counts)
+    for i in range(0, len(rows), REBUILD_CHUNK_SIZE):
+        conn.execute(MoodRollup.__table__.insert(), rows[i:i + REBUILD_CHUNK_SIZE])
@@ -1,5 +1,5 @@
-from datetime import datetime
-from typing import Optional
+from datetime import date, datetime
+from typing import Any, Dict, List, Literal, Optional, Union, get_args
 from uuid import UUID
 
 from pydantic import BaseModel, EmailStr
@@ -29,7 +29,7 @@ class UserOut(BaseModel):
     id: str
     email: EmailStr
     name: str
-    sex: str
+    sex: Optional[str] = None
     created_at: datetime
     reset_token: Optional[str] = None
 
@@ -94,3 +94,144 @@ class WritingExerciseEntrySchema(BaseModel):
 
 class TextInput(BaseModel):
     text: str
+
+
+# Languages the catalog has recommendations in.
+Language = Literal["uk", "en"]
+LANGUAGES = get_args(Language)
+
+
+class BatchAnalyzeRequest(BaseModel):
+    texts: List[str]
+    language: Language = "uk"
+    user_id: Optional[UUID] = None
+
+
+class MessageOut(BaseModel):
+    message: str
+
+
+class StatusOut(BaseModel):
+    status: str
+
+
+class UserSummary(BaseModel):
+    id: str
+    name: str
+    email: str
+
+
+class UserRegistered(UserSummary):
+    message: str
+
+
+class EmailCheckOut(BaseModel):
+    exists: bool
+    provider: Optional[str] = None
+
+
+class TipPayload(BaseModel):
+    id: str
+    title: str
+    description: str
+    type: str
+
+
+class BreathingExercisePayload(TipPayload):
+    inhale_duration: int
+    hold_duration: int
+    exhale_duration: int
+    cycles: int
+
+
+class Recommendation(BaseModel):
+    emotion: str
+    data: List[Union[BreathingExercisePayload, TipPayload]]
+
+
+class AnalyzeResponse(BaseModel):
+    emotions: List[Recommendation]
+
+
+class BatchAnalyzeResponse(BaseModel):
+    items: List[AnalyzeResponse]
+
+
+class CatalogRefreshOut(BaseModel):
+    message: str
+    entries: int
+
+
+class CacheStatsOut(BaseModel):
+    size: int
+    max_entries: int
+    hits: int
+    shared_hits: int
+    misses: int
+    evictions: int
+    expirations: int
+
+
+class DiaryEntryOut(BaseModel):
+    date: str
+    emotion: str
+    text: str
+
+
+class DiaryPage(BaseModel):
+    """One page of analyses, flattened to an entry per recommended emotion;
+    ``limit`` and ``next_cursor`` count analyses, not entries. Without
+    ``limit`` or ``cursor`` the page is the whole diary."""
+
+    entries: List[DiaryEntryOut]
+    next_cursor: Optional[str] = None
+
+
+class WritingExerciseCreated(BaseModel):
+    message: str
+    entry: WritingExerciseEntrySchema
+
+
+class MoodTrendPoint(BaseModel):
+    period_start: date
+    total: int
+    emotions: Dict[str, int]
+
+
+class MoodAnalytics(BaseModel):
+    period: str
+    start: date
+    end: date
+    histogram: Dict[str, int]
+    trend: List[MoodTrendPoint]
+
+
+class ModelStatus(BaseModel):
+    state: str
+    model: str
+    backend: str
+    load_seconds: Optional[float] = None
+    cold_start_seconds: Optional[float] = None
+    warmup: List[Dict[str, Any]]
+    peak_rss_mb: Optional[float] = None
+    error: Optional[str] = None
+
+
+class PoolStats(BaseModel):
+    pool: str
+    connects: int
+    checkouts: int
+    timeouts: int
+    size: Optional[int] = None
+    checkedin: Optional[int] = None
+    checkedout: Optional[int] = None
+    overflow: Optional[int] = None
+
+
+class HasherStats(BaseModel):
+    workers: int
+    max_pending: int
+    rounds: int
+    pending: int
+    completed: int
+    rejected: int
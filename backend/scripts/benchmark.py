@@ -0,0 +1,414 @@
+"""HTTP load benchmark for the API, reported as JSON.
+
+Boots ``app.main:app`` under uvicorn against a fresh SQLite database seeded
+from ``db_fill/*.json`` and drives the hot endpoints at a fixed concurrency.
+Without ``--model`` a tiny randomly initialized XLM-R checkpoint is generated,
+so the run is offline and reproducible; the scores are meaningless but the
+request path is the real one. Run from the backend directory:
+
+    python -m scripts.benchmark [--workers 2] [--concurrency 32] [--requests 500] [--output bench.json]
+
+Extra app settings can be passed through, e.g. ``--env BCRYPT_ROUNDS=10``.
+With ``--model-server`` the workers score on one shared model server process,
+whose memory is reported alongside theirs.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import secrets
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from scripts.compare_precision import load_texts
+
+SCENARIOS = ("analyze", "diary", "login", "check_email")
+USERS_JSON_PATH = "db_fill/users.json"
+SPECIAL_TOKENS = ["<s>", "<pad>", "</s>", "<unk>", "<mask>"]
+
+
+def build_tiny_model(path: Path, texts, num_labels: int = 28, seed: int = 0) -> Path:
+    """Writes a 2-layer XLM-R classifier with a word-level tokenizer built from ``texts``."""
+    import torch
+    from tokenizers import Tokenizer, models, pre_tokenizers, processors
+    from transformers import PreTrainedTokenizerFast, XLMRobertaConfig, XLMRobertaForSequenceClassification
+
+    if (path / "config.json").exists():
+        return path
+
+    words = sorted({word for text in texts for word in text.lower().split()})
+    vocab = {token: i for i, token in enumerate(SPECIAL_TOKENS + words)}
+    tokenizer = Tokenizer(models.WordLevel(vocab, unk_token="<unk>"))
+    tokenizer.pre_tokenizer = pre_tokenizers.Whitespace()
+    tokenizer.post_processor = processors.TemplateProcessing(
+        single="<s> $A </s>",
+        pair="<s> $A </s> </s> $B </s>",
+        special_tokens=[("<s>", vocab["<s>"]), ("</s>", vocab["</s>"])],
+    )
+    fast_tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer,
+        bos_token="<s>", eos_token="</s>", unk_token="<unk>", pad_token="<pad>", mask_token="<mask>",
+        model_max_length=512,
+    )
+
+    torch.manual_seed(seed)
+    model_config = XLMRobertaConfig(
+        vocab_size=len(vocab),
+        hidden_size=32,
+        num_hidden_layers=2,
+        num_attention_heads=2,
+        intermediate_size=64,
+        max_position_embeddings=514,
+        num_labels=num_labels,
+        bos_token_id=vocab["<s>"],
+        pad_token_id=vocab["<pad>"],
+        eos_token_id=vocab["</s>"],
+    )
+    model = XLMRobertaForSequenceClassification(model_config)
+    path.mkdir(parents=True, exist_ok=True)
+    model.save_pretrained(path)
+    fast_tokenizer.save_pretrained(path)
+    return path
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def seed_database(env: dict):
+    subprocess.run(
+        [sys.executable, "-m", "scripts.create_tables"],
+        env=env, check=True, stdout=subprocess.DEVNULL,
+    )
+
+
+def start_server(env: dict, port: int, workers: int, log_path: Path) -> subprocess.Popen:
+    with open(log_path, "wb") as log:
+        return subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app",
+             "--host", "127.0.0.1", "--port", str(port),
+             "--workers", str(workers), "--log-level", "warning"],
+            env=env, stderr=log,
+        )
+
+
+def start_model_server(env: dict, socket_path: Path, log_path: Path) -> subprocess.Popen:
+    with open(log_path, "wb") as log:
+        return subprocess.Popen(
+            [sys.executable, "-m", "app.inference.server", "--socket", str(socket_path)],
+            env=env, stdout=subprocess.DEVNULL, stderr=log,
+        )
+
+
+def _log_tail(path: Path, lines: int = 20) -> str:
+    try:
+        return "\n".join(path.read_text(encoding="utf-8", errors="replace").splitlines()[-lines:])
+    except OSError:
+        return ""
+
+
+def wait_ready(base_url: str, workers: int, processes, timeout: float = 300):
+    """Waits for /ready; ``processes`` are the (name, Popen, log path) entries
+    that must stay alive meanwhile, so a crash at startup fails at once."""
+    # /ready is answered by whichever worker accepts the connection, so wait
+    # for a run of successes rather than a single one.
+    deadline = time.monotonic() + timeout
+    streak = 0
+    while time.monotonic() < deadline:
+        for name, process, log_path in processes:
+            if process.poll() is not None:
+                raise RuntimeError(
+                    f"The {name} exited with code {process.returncode} "
+                    f"before {base_url} became ready; {log_path} ends with:\n{_log_tail(log_path)}"
+                )
+        try:
+            ok = httpx.get(f"{base_url}/ready", timeout=5).status_code == 200
+        except httpx.HTTPError:
+            ok = False
+        streak = streak + 1 if ok else 0
+        if streak >= workers * 4:
+            return
+        time.sleep(0.1 if ok else 0.5)
+    logs = ", ".join(str(log_path) for _, _, log_path in processes)
+    raise RuntimeError(f"Server at {base_url} did not become ready within {timeout:.0f}s (logs: {logs})")
+
+
+def _read_status(pid: int) -> dict:
+    fields = {}
+    with open(f"/proc/{pid}/status") as file:
+        for line in file:
+            name, _, value = line.partition(":")
+            fields[name] = value.strip()
+    return fields
+
+
+def _process_tree() -> dict:
+    """Maps every live pid to the pids of its direct children."""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                parent = int(_read_status(int(entry)).get("PPid", 0))
+            except (FileNotFoundError, ProcessLookupError, ValueError):
+                continue
+            children.setdefault(parent, []).append(int(entry))
+    return children
+
+
+def _descendants(pid: int, children: dict) -> list:
+    found = []
+    for child in children.get(pid, []):
+        found.append(child)
+        found.extend(_descendants(child, children))
+    return found
+
+
+def _child_role(pid: int) -> str:
+    with open(f"/proc/{pid}/cmdline", "rb") as file:
+        cmdline = file.read()
+    if b"resource_tracker" in cmdline:
+        return "resource_tracker"
+    if b"spawn_main" in cmdline:
+        # The only process pool the app starts is the bcrypt hasher.
+        return "hasher"
+    return "child"
+
+
+def _memory(pid: int, role: str) -> dict:
+    status = _read_status(pid)
+    return {
+        "pid": pid,
+        "role": role,
+        "rss_mb": round(int(status.get("VmRSS", "0 kB").split()[0]) / 1024, 1),
+        "peak_rss_mb": round(int(status.get("VmHWM", "0 kB").split()[0]) / 1024, 1),
+    }
+
+
+def _with_children(pid: int, role: str, children: dict) -> dict:
+    """A serving process's memory, plus every process it started and their total."""
+    report = _memory(pid, role)
+    report["children"] = []
+    for child in _descendants(pid, children):
+        try:
+            report["children"].append(_memory(child, _child_role(child)))
+        except (FileNotFoundError, ProcessLookupError):
+            continue
+    report["total_rss_mb"] = round(report["rss_mb"] + sum(child["rss_mb"] for child in report["children"]), 1)
+    return report
+
+
+def process_rss(root_pid: int, workers: int, model_server_pid: int = None) -> list:
+    """RSS per serving process from /proc, each with its own child processes.
+
+    With one worker uvicorn serves from the root process itself, and the
+    root's children (hasher pool, resource tracker) belong to it. With more,
+    the root is a supervisor and each direct child that is not a resource
+    tracker is a worker owning its own subtree.
+    """
+    children = _process_tree()
+    if workers == 1:
+        report = [_with_children(root_pid, "worker", children)]
+    else:
+        report = [_memory(root_pid, "supervisor")]
+        for pid in children.get(root_pid, []):
+            try:
+                if _child_role(pid) == "resource_tracker":
+                    report.append(_memory(pid, "resource_tracker"))
+                else:
+                    report.append(_with_children(pid, "worker", children))
+            except (FileNotFoundError, ProcessLookupError):
+                continue
+    if model_server_pid:
+        report.append(_with_children(model_server_pid, "model_server", children))
+    return report
+
+
+def percentile(sorted_values, fraction: float):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def make_requests(texts, users, unique_texts: bool):
+    user = users[0]
+
+    def analyze(i):
+        text = texts[i % len(texts)]
+        if unique_texts:
+            text = f"{text} #{i}"
+        return "POST", "/api/analyze", {"json": {"text": text, "language": "uk", "user_id": user["id"]}}
+
+    def diary(i):
+        return "GET", f"/api/diary/{user['id']}", {}
+
+    def login(i):
+        account = users[i % len(users)]
+        return "POST", "/users/login", {"json": {"email": account["email"], "password": account["password"]}}
+
+    def check_email(i):
+        return "GET", "/users/check-email", {"params": {"email": users[i % len(users)]["email"]}}
+
+    return {"analyze": analyze, "diary": diary, "login": login, "check_email": check_email}
+
+
+async def run_scenario(client: httpx.AsyncClient, make_request, total: int, concurrency: int, warmup: int):
+    for i in range(warmup):
+        method, url, kwargs = make_request(i)
+        await client.request(method, url, **kwargs)
+
+    latencies = []
+    statuses = {}
+    counter = iter(range(total))
+
+    async def worker():
+        for i in counter:
+            method, url, kwargs = make_request(i)
+            started = time.perf_counter()
+            try:
+                status = (await client.request(method, url, **kwargs)).status_code
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 1) if elapsed else None,
+        "latency_ms": {
+            name: round(percentile(latencies, fraction) * 1000, 2)
+            for name, fraction in (("p50", 0.50), ("p95", 0.95), ("p99", 0.99))
+        } | {"max": round(latencies[-1] * 1000, 2), "mean": round(sum(latencies) / len(latencies) * 1000, 2)},
+        "statuses": statuses,
+    }
+
+
+async def drive(base_url: str, scenarios, requests, args, server_pid: int, model_server_pid: int = None) -> dict:
+    results = {}
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        for name in scenarios:
+            results[name] = await run_scenario(
+                client, requests[name], args.requests, args.concurrency, args.warmup
+            )
+            results[name]["rss"] = process_rss(server_pid, args.workers, model_server_pid)
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", help="model directory (default: generate a tiny random XLM-R)")
+    parser.add_argument("--workdir", help="where to keep the database and tiny model (default: a temp dir)")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--concurrency", type=int, default=16, help="in-flight requests")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--warmup", type=int, default=5, help="unmeasured requests per scenario")
+    parser.add_argument("--timeout", type=float, default=60, help="per-request timeout in seconds")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"comma-separated subset of {SCENARIOS}")
+    parser.add_argument("--unique-texts", action="store_true", help="make every analyzed text unique (no cache hits)")
+    parser.add_argument("--model-server", action="store_true", help="score on one shared model server process")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="extra app setting")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {sorted(unknown)}")
+
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="bench-"))
+    workdir.mkdir(parents=True, exist_ok=True)
+    texts = load_texts()
+    with open(USERS_JSON_PATH, 'r', encoding='utf-8') as file:
+        users = json.load(file)
+    model = Path(args.model) if args.model else build_tiny_model(workdir / "tiny-model", texts)
+
+    database = workdir / "bench.db"
+    if database.exists():
+        database.unlink()
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{database}",
+        "MODEL_NAME": str(model),
+        "MODEL_CACHE_DIR": str(workdir / "model-cache"),
+    }
+    # The API refuses to start without a reset-token signing secret.
+    env.setdefault("RESET_TOKEN_SECRET", secrets.token_hex())
+    env.update(item.split("=", 1) for item in args.env)
+
+    seed_database(env)
+    processes = []
+    model_server = None
+    if args.model_server:
+        env["MODEL_SERVER_SOCKET"] = str(workdir / "model.sock")
+        model_server = start_model_server(env, workdir / "model.sock", workdir / "model-server.log")
+        processes.append(("model server", model_server, workdir / "model-server.log"))
+    model_server_pid = model_server.pid if model_server else None
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = start_server(env, port, args.workers, workdir / "server.log")
+    processes.append(("API server", server, workdir / "server.log"))
+    try:
+        wait_ready(base_url, args.workers, processes)
+        requests = make_requests(texts, users, args.unique_texts)
+        results = asyncio.run(drive(base_url, scenarios, requests, args, server.pid, model_server_pid))
+        rss = process_rss(server.pid, args.workers, model_server_pid)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+        if model_server:
+            model_server.terminate()
+            model_server.wait(timeout=30)
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "model": "tiny-random" if not args.model else str(model),
+            "workers": args.workers,
+            "model_server": args.model_server,
+            "concurrency": args.concurrency,
+            "requests_per_scenario": args.requests,
+            "unique_texts": args.unique_texts,
+            "env": dict(item.split("=", 1) for item in args.env),
+        },
+        "scenarios": results,
+        "rss": rss,
+    }
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
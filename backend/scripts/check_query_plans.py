@@ -0,0 +1,102 @@
+"""Checks that the queries behind the hot endpoints are served by an index.
+
+Each query is listed with the tables it must not scan. It is executed once
+with an event hook capturing the exact SQL and parameters the driver
+receives, then the same statement is run through EXPLAIN. Any sequential
+scan of one of those tables fails the check. On PostgreSQL sequential scans
+are disabled for the check, so tiny tables in a dev database don't hide a
+missing index behind a cheaper seq-scan estimate.
+
+    python -m scripts.check_query_plans
+"""
+import re
+import sys
+import uuid
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import event, select
+
+from app.api.analysis import diary_entries_query, writing_entries_query
+from app.api.analytics import mood_rollups_query
+from app.catalog import catalog_version_query
+from app.database import SessionLocal, engine
+from app.db_models import User
+from app.pagination import encode_cursor
+
+
+def hot_queries():
+    user_id = uuid.uuid4()
+    cursor = encode_cursor(datetime.utcnow(), uuid.uuid4())
+    return [
+        ("diary page", ["analyses"], diary_entries_query(user_id).limit(101)),
+        ("diary page after cursor", ["analyses"], diary_entries_query(user_id, cursor).limit(101)),
+        ("writing page", ["writing_entries"], writing_entries_query(user_id).limit(101)),
+        ("writing page after cursor", ["writing_entries"], writing_entries_query(user_id, cursor).limit(101)),
+        # Every analysis request checks this once per CATALOG_REFRESH_SECONDS;
+        # the full reload only follows when it reports a change.
+        ("catalog version", ["emotions", "tips", "breathing_exercises"], catalog_version_query()),
+        ("user by email", ["users"], select(User).where(User.email == "user@e.com")),
+        ("mood rollups in range", ["mood_rollups"],
+         mood_rollups_query(user_id, "day", date.today() - timedelta(days=29), date.today())),
+    ]
+
+
+def capture_sql(db, query):
+    captured = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        db.execute(query).all()
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return captured[-1]
+
+
+def explain(db, statement, parameters):
+    conn = db.connection()
+    if engine.dialect.name == "sqlite":
+        rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).fetchall()
+        return [row[-1] for row in rows]
+    if engine.dialect.name == "postgresql":
+        conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+    rows = conn.exec_driver_sql("EXPLAIN " + statement, parameters).fetchall()
+    return [row[0] for row in rows]
+
+
+def uses_seq_scan(plan, table) -> bool:
+    for line in plan:
+        if re.search(rf"Seq Scan on {table}\b", line):
+            return True
+        # SQLite: "SCAN <table>" without an index is a full table scan, and so
+        # is a bare "SEARCH <table>" (e.g. max() over an unindexed column).
+        if re.match(rf"\s*(SCAN|SEARCH) {table}\b", line) and not re.search(r"INDEX|PRIMARY KEY", line):
+            return True
+    return False
+
+
+def main() -> int:
+    db = SessionLocal()
+    failures = 0
+    try:
+        for name, tables, query in hot_queries():
+            statement, parameters = capture_sql(db, query)
+            plan = explain(db, statement, parameters)
+            db.rollback()
+            ok = not any(uses_seq_scan(plan, table) for table in tables)
+            failures += not ok
+            print(f" [{'ok' if ok else 'SEQ SCAN'}] {name}")
+            for line in plan:
+                print(f"     {line}")
+    finally:
+        db.close()
+
+    if failures:
+        print(f" {failures} queries fall back to a sequential scan. Run `python -m scripts.migrate`.")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""Accuracy-vs-speed check for the PyTorch precision modes.
+
+Scores a held-out text set with every MODEL_PRECISION mode and compares each
+one against fp32: how often the top-3 emotions agree and how far the 28 scores
+drift. Run from the backend directory:
+
+    python -m scripts.compare_precision [--texts file.txt] [--json]
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+from transformers import AutoTokenizer
+
+from app.core import config
+from app.inference.backends import PRECISIONS, TorchBackend
+from app.model import LABELS
+
+HELD_OUT_JSON_PATHS = ("db_fill/diary_entries.json", "db_fill/writing_exercise_notes.json")
+BATCH_SIZE = 8
+
+
+def load_texts(texts_path=None):
+    if texts_path:
+        with open(texts_path, 'r', encoding='utf-8') as file:
+            return [line.strip() for line in file if line.strip()]
+
+    texts = []
+    for path in HELD_OUT_JSON_PATHS:
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as file:
+                texts.extend(entry["text"] for entry in json.load(file))
+    return texts
+
+
+def score(backend, texts):
+    started = time.perf_counter()
+    scores = []
+    for i in range(0, len(texts), BATCH_SIZE):
+        scores.extend(backend(texts[i:i + BATCH_SIZE]))
+    return np.array(scores, dtype=np.float32), time.perf_counter() - started
+
+
+def top3(scores):
+    return [tuple(LABELS[i] for i in np.argsort(-row)[:3]) for row in scores]
+
+
+def compare(texts, model_name=config.MODEL_NAME):
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    runs = {}
+    for precision in PRECISIONS:
+        backend = TorchBackend(model_name, tokenizer, precision=precision)
+        score(backend, texts[:1])  # warm-up
+        runs[precision] = score(backend, texts)
+        del backend
+
+    reference, reference_seconds = runs["fp32"]
+    reference_top3 = top3(reference)
+    report = {}
+    for precision, (scores, seconds) in runs.items():
+        mode_top3 = top3(scores)
+        drift = np.abs(scores - reference)
+        report[precision] = {
+            "seconds": round(seconds, 4),
+            "speedup": round(reference_seconds / seconds, 2) if seconds else None,
+            "top3_exact_match": float(np.mean([a == b for a, b in zip(mode_top3, reference_top3)])),
+            "top3_set_match": float(np.mean([set(a) == set(b) for a, b in zip(mode_top3, reference_top3)])),
+            "top1_match": float(np.mean([a[0] == b[0] for a, b in zip(mode_top3, reference_top3)])),
+            "max_score_drift": float(drift.max()),
+            "mean_score_drift": float(drift.mean()),
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--texts", help="file with one held-out text per line")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    texts = load_texts(args.texts)
+    if not texts:
+        print(" No held-out texts found.")
+        return
+
+    report = compare(texts)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f" {len(texts)} held-out texts, reference: fp32")
+    print(f" {'mode':<6}{'seconds':>9}{'speedup':>9}{'top1':>7}{'top3':>7}{'top3 set':>10}{'max drift':>11}{'mean drift':>12}")
+    for precision, row in report.items():
+        print(
+            f" {precision:<6}{row['seconds']:>9.3f}{row['speedup']:>9.2f}{row['top1_match']:>7.0%}"
+            f"{row['top3_exact_match']:>7.0%}{row['top3_set_match']:>10.0%}"
+            f"{row['max_score_drift']:>11.2e}{row['mean_score_drift']:>12.2e}"
+        )
+
+
+if __name__ == "__main__":
+    main()
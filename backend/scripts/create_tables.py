@@ -1,11 +1,26 @@
+"""Creates the schema and seeds it from db_fill/*.json.
+
+Seeding is incremental: rows that already exist (same id, email, emotion name
+or tip/exercise title) are skipped by the database itself through
+``ON CONFLICT DO NOTHING``, so the script can be re-run after adding content to
+the JSON files. Pass ``--reset`` to drop every table first.
+
+    python -m scripts.create_tables [--reset] [--chunk-size 500]
+"""
+import argparse
+import json
 import uuid
 from datetime import datetime
-from app.database import engine, Base, create_db, SessionLocal
-from app.db_models import Emotion, Tip, BreathingExercise, User, DiaryEntry, WritingExerciseEntry
-import json
-from sqlalchemy.orm import Session
-from uuid import uuid4
-import bcrypt
+from itertools import islice
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import rollups
+from app.core.security import hash_passwords, shutdown_hasher
+from app.database import engine, Base, create_db
+from app.db_models import Emotion, Tip, BreathingExercise, User, Analysis, WritingExerciseEntry
+from app.migrations import upgrade
 
 # Paths to JSON data
 EMOTIONS_JSON_PATH = "db_fill/emotions.json"
@@ -15,223 +30,251 @@ DIARY_JSON_PATH = "db_fill/diary_entries.json"
 USERS_JSON_PATH = "db_fill/users.json"
 WRITING_ENTRIES_JSON_PATH = "db_fill/writing_exercise_notes.json"
 
-# Load JSON data from file
-def load_json_data(file_path):
+CHUNK_SIZE = 500
+READ_SIZE = 1 << 16
+ARRAY_DELIMITERS = ", \t\r\n]"
+
+INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+# Stream the items of a top-level JSON array without loading the whole file
+def iter_json_array(file_path):
+    decoder = json.JSONDecoder()
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            return json.load(file)
+        file = open(file_path, 'r', encoding='utf-8')
     except FileNotFoundError:
         print(f" Error: File '{file_path}' not found.")
-        return []
+        return
+
+    with file:
+        buffer = ""
+        eof = False
+        started = False
+        while True:
+            buffer = buffer.lstrip()
+            if started:
+                buffer = buffer.lstrip(",").lstrip()
+            if not started and buffer:
+                if not buffer.startswith("["):
+                    raise ValueError(f"{file_path} does not contain a JSON array")
+                buffer = buffer[1:]
+                started = True
+                continue
+            if started and buffer.startswith("]"):
+                return
+            try:
+                item, end = decoder.raw_decode(buffer) if buffer else (None, 0)
+            except json.JSONDecodeError:
+                end = 0
+            # A value is only complete once a delimiter follows it: "12" at
+            # the buffer edge may continue as "1234" or "12e3".
+            if end == 0 or (end == len(buffer) or buffer[end] not in ARRAY_DELIMITERS) and not eof:
+                if eof:
+                    raise ValueError(f"{file_path} ends inside a JSON array")
+                chunk = file.read(READ_SIZE)
+                eof = not chunk
+                buffer += chunk
+                continue
+            yield item
+            buffer = buffer[end:]
 
 
-# Seed Emotions
-def seed_emotions():
-    db: Session = SessionLocal()
-    emotions = load_json_data(EMOTIONS_JSON_PATH)
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
 
+def insert_ignoring_duplicates(conn, model, rows, chunk_size=CHUNK_SIZE):
+    """Bulk-inserts rows in chunks; rows hitting a primary key or unique index are skipped."""
     try:
-        for emotion in emotions:
-            existing = db.query(Emotion).filter(Emotion.name == emotion).first()
-            if not existing:
-                new_emotion = Emotion(id=uuid4(), name=emotion)
-                db.add(new_emotion)
-        db.commit()
-        print(f" {len(emotions)} emotions added to the database.")
-    except Exception as e:
-        db.rollback()
-        print(" Failed to add emotions:", e)
-    finally:
-        db.close()
+        insert = INSERTS[conn.dialect.name]
+    except KeyError:
+        raise RuntimeError(f"Seeding does not support the '{conn.dialect.name}' dialect")
 
+    before = conn.execute(select(func.count()).select_from(model)).scalar()
+    statement = insert(model).on_conflict_do_nothing()
+    for chunk in chunked(rows, chunk_size):
+        conn.execute(statement, chunk)
+    after = conn.execute(select(func.count()).select_from(model)).scalar()
+    return after - before
 
-# Seed Users
-def seed_users():
-    db: Session = SessionLocal()
-    users = load_json_data(USERS_JSON_PATH)
 
-    try:
-        for user_data in users:
-            existing = db.query(User).filter(User.email == user_data["email"]).first()
-            if not existing:
-                if not all(k in user_data for k in ("password", "sex")):
-                    print(f" Skipping user '{user_data['email']}', missing fields.")
-                    continue
-
-                hashed_password = bcrypt.hashpw(user_data["password"].encode("utf-8"), bcrypt.gensalt())
-                new_user = User(
-                    id=uuid.UUID(user_data["id"]),
-                    email=user_data["email"],
-                    name=user_data["name"],
-                    password_hash=hashed_password.decode("utf-8"),
-                    sex=user_data["sex"]
-                )
-                db.add(new_user)
-
-        db.commit()
-        print(f" {len(users)} users added to the database.")
-    except Exception as e:
-        db.rollback()
-        print(" Failed to add users:", e)
-    finally:
-        db.close()
+def load_emotion_ids(conn):
+    return {name.lower(): emotion_id for emotion_id, name in conn.execute(select(Emotion.id, Emotion.name))}
 
 
-# Seed Tips
-def seed_tips():
-    db: Session = SessionLocal()
-    tips = load_json_data(TIPS_JSON_PATH)
+def _parse_date(value):
+    return datetime.fromisoformat(value) if value else datetime.utcnow()
 
-    try:
-        for tip_data in tips:
-            emotion = db.query(Emotion).filter(Emotion.name.ilike(tip_data["emotion"])).first()
-            if not emotion:
-                print(f" Emotion '{tip_data['emotion']}' not found. Skipping.")
-                continue
 
-            existing = db.query(Tip).filter(
-                Tip.title == tip_data["title"],
-                Tip.emotion_id == emotion.id,
-                Tip.language == tip_data["language"]
-            ).first()
-
-            if not existing:
-                new_tip = Tip(
-                    id=uuid4(),
-                    title=tip_data["title"],
-                    description=tip_data["description"],
-                    type=tip_data["type"],
-                    emotion_id=emotion.id,
-                    language=tip_data["language"]
-                )
-                db.add(new_tip)
-
-        db.commit()
-        print(f" {len(tips)} tips added to the database.")
-    except Exception as e:
-        db.rollback()
-        print(" Failed to add tips:", e)
-    finally:
-        db.close()
+# Seed Emotions
+def seed_emotions(conn, chunk_size=CHUNK_SIZE):
+    rows = ({"id": uuid.uuid4(), "name": emotion} for emotion in iter_json_array(EMOTIONS_JSON_PATH))
+    added = insert_ignoring_duplicates(conn, Emotion, rows, chunk_size)
+    print(f" {added} emotions added to the database.")
 
 
-# Seed Breathing Exercises
-def seed_breathing_exercises():
-    db: Session = SessionLocal()
-    exercises = load_json_data(BREATHING_JSON_PATH)
+# Seed Users
+def seed_users(conn, chunk_size=CHUNK_SIZE):
+    existing = set(conn.execute(select(User.email)).scalars())
+    new_users = []
+    for user_data in iter_json_array(USERS_JSON_PATH):
+        if user_data["email"] in existing:
+            continue
+        if not all(k in user_data for k in ("password", "sex")):
+            print(f" Skipping user '{user_data['email']}', missing fields.")
+            continue
+        new_users.append(user_data)
+
+    # bcrypt dominates seeding time; only new users are hashed, in parallel.
+    hashes = hash_passwords([user_data["password"] for user_data in new_users])
+    rows = (
+        {
+            "id": uuid.UUID(user_data["id"]),
+            "email": user_data["email"],
+            "name": user_data["name"],
+            "password_hash": password_hash,
+            "sex": user_data["sex"],
+            "auth_provider": "local",
+        }
+        for user_data, password_hash in zip(new_users, hashes)
+    )
+    added = insert_ignoring_duplicates(conn, User, rows, chunk_size)
+    print(f" {added} users added to the database.")
+
+
+def _catalog_rows(file_path, emotion_ids, to_row):
+    for data in iter_json_array(file_path):
+        emotion_id = emotion_ids.get(data["emotion"].lower())
+        if not emotion_id:
+            print(f" Emotion '{data['emotion']}' not found. Skipping.")
+            continue
+        yield to_row(data, emotion_id)
 
-    try:
-        for exercise_data in exercises:
-            emotion = db.query(Emotion).filter(Emotion.name.ilike(exercise_data["emotion"])).first()
-            if not emotion:
-                print(f" Emotion '{exercise_data['emotion']}' not found. Skipping.")
-                continue
 
-            language = exercise_data.get("language", "en")
-
-            existing = db.query(BreathingExercise).filter(
-                BreathingExercise.title == exercise_data["title"],
-                BreathingExercise.emotion_id == emotion.id,
-                BreathingExercise.language == language
-            ).first()
-
-            if not existing:
-                new_exercise = BreathingExercise(
-                    id=uuid4(),
-                    title=exercise_data["title"],
-                    description=exercise_data["description"],
-                    inhale_duration=exercise_data.get("inhale_duration", 4),
-                    hold_duration=exercise_data.get("hold_duration", 4),
-                    exhale_duration=exercise_data.get("exhale_duration", 4),
-                    cycles=exercise_data.get("cycles", 3),
-                    emotion_id=emotion.id,
-                    language=language
-                )
-                db.add(new_exercise)
-
-        db.commit()
-        print(f" {len(exercises)} breathing exercises added to the database.")
-    except Exception as e:
-        db.rollback()
-        print(" Failed to add breathing exercises:", e)
-    finally:
-        db.close()
+# Seed Tips
+def seed_tips(conn, emotion_ids, chunk_size=CHUNK_SIZE):
+    def to_row(tip_data, emotion_id):
+        return {
+            "id": uuid.uuid4(),
+            "title": tip_data["title"],
+            "description": tip_data["description"],
+            "type": tip_data["type"],
+            "emotion_id": emotion_id,
+            "language": tip_data["language"],
+        }
 
+    added = insert_ignoring_duplicates(conn, Tip, _catalog_rows(TIPS_JSON_PATH, emotion_ids, to_row), chunk_size)
+    print(f" {added} tips added to the database.")
 
-# Seed Diary Entries
-def seed_diary_entries():
-    db: Session = SessionLocal()
-    diary_entries = load_json_data(DIARY_JSON_PATH)
 
-    try:
-        for entry_data in diary_entries:
-            user = db.query(User).filter(User.id == uuid.UUID(entry_data["user_id"])).first()
-            if not user:
-                print(f" User with ID '{entry_data['user_id']}' not found. Skipping.")
-                continue
+# Seed Breathing Exercises
+def seed_breathing_exercises(conn, emotion_ids, chunk_size=CHUNK_SIZE):
+    def to_row(exercise_data, emotion_id):
+        return {
+            "id": uuid.uuid4(),
+            "title": exercise_data["title"],
+            "description": exercise_data["description"],
+            "inhale_duration": exercise_data.get("inhale_duration", 4),
+            "hold_duration": exercise_data.get("hold_duration", 4),
+            "exhale_duration": exercise_data.get("exhale_duration", 4),
+            "cycles": exercise_data.get("cycles", 3),
+            "emotion_id": emotion_id,
+            "language": exercise_data.get("language", "en"),
+        }
+
+    rows = _catalog_rows(BREATHING_JSON_PATH, emotion_ids, to_row)
+    added = insert_ignoring_duplicates(conn, BreathingExercise, rows, chunk_size)
+    print(f" {added} breathing exercises added to the database.")
+
+
+def _user_rows(conn, file_path, to_row):
+    user_ids = set(conn.execute(select(User.id)).scalars())
+    for entry_data in iter_json_array(file_path):
+        user_id = uuid.UUID(entry_data["user_id"])
+        if user_id not in user_ids:
+            print(f" User with ID '{entry_data['user_id']}' not found. Skipping.")
+            continue
+        yield to_row(entry_data, user_id)
 
-            existing = db.query(DiaryEntry).filter(
-                DiaryEntry.text == entry_data["text"],
-                DiaryEntry.date == datetime.strptime(entry_data["date"], "%Y-%m-%dT%H:%M:%S")
-            ).first()
-
-            if not existing:
-                new_entry = DiaryEntry(
-                    id=str(uuid4()),
-                    text=entry_data["text"],
-                    emotion=entry_data["emotion"],
-                    date=datetime.strptime(entry_data["date"], "%Y-%m-%dT%H:%M:%S"),
-                    user_id=user.id
-                )
-                db.add(new_entry)
-
-        db.commit()
-        print(f" {len(diary_entries)} diary entries added to the database.")
-    except Exception as e:
-        db.rollback()
-        print(" Failed to add diary entries:", e)
-    finally:
-        db.close()
 
-def seed_writing_entries():
-    db: Session = SessionLocal()
-    entries = load_json_data(WRITING_ENTRIES_JSON_PATH)
+# Seed Diary Entries
+def seed_diary_entries(conn, chunk_size=CHUNK_SIZE):
+    def to_row(entry_data, user_id):
+        return {
+            "id": uuid.UUID(entry_data["id"]),
+            "text": entry_data["text"],
+            "scores": None,
+            "top_emotions": [entry_data["emotion"]],
+            "language": None,
+            "date": _parse_date(entry_data["date"]),
+            "user_id": user_id,
+        }
+
+    rows = _user_rows(conn, DIARY_JSON_PATH, to_row)
+    added = insert_ignoring_duplicates(conn, Analysis, rows, chunk_size)
+    if added:
+        # Bulk inserts bypass the analyze routes that keep the rollups current.
+        rollups.rebuild(conn)
+    print(f" {added} diary entries added to the database.")
+
+
+def seed_writing_entries(conn, chunk_size=CHUNK_SIZE):
+    def to_row(entry_data, user_id):
+        return {
+            "id": uuid.UUID(entry_data["id"]),
+            "text": entry_data["text"],
+            "date": _parse_date(entry_data["date"]),
+            "user_id": user_id,
+        }
+
+    rows = _user_rows(conn, WRITING_ENTRIES_JSON_PATH, to_row)
+    added = insert_ignoring_duplicates(conn, WritingExerciseEntry, rows, chunk_size)
+    print(f" {added} writing entries added to the database.")
+
+
+def seed_all(chunk_size=CHUNK_SIZE):
+    # One transaction per file: a bad file leaves earlier ones seeded.
+    with engine.begin() as conn:
+        seed_users(conn, chunk_size)
+    with engine.begin() as conn:
+        seed_emotions(conn, chunk_size)
+    with engine.begin() as conn:
+        emotion_ids = load_emotion_ids(conn)
+        seed_tips(conn, emotion_ids, chunk_size)
+        seed_breathing_exercises(conn, emotion_ids, chunk_size)
+    with engine.begin() as conn:
+        seed_diary_entries(conn, chunk_size)
+    with engine.begin() as conn:
+        seed_writing_entries(conn, chunk_size)
 
-    try:
-        for entry_data in entries:
-            existing = db.query(WritingExerciseEntry).filter(WritingExerciseEntry.id == entry_data["id"]).first()
-            if not existing:
-                new_entry = WritingExerciseEntry(
-                    id=entry_data["id"],
-                    text=entry_data["text"],
-                    date=entry_data["date"],
-                    user_id=entry_data["user_id"]
-                )
-                db.add(new_entry)
-
-        db.commit()
-        print(f"{len(entries)} writing entries added to the database.")
-    except Exception as e:
-        db.rollback()
-        print("Failed to add writing entries:", e)
-    finally:
-        db.close()
 
 if __name__ == "__main__":
-    print(" Dropping all tables...")
-    Base.metadata.drop_all(bind=engine)
-    print(" All tables dropped successfully!")
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reset", action="store_true", help="drop all tables before seeding")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="rows per INSERT statement")
+    args = parser.parse_args()
+
+    if args.reset:
+        print(" Dropping all tables...")
+        Base.metadata.drop_all(bind=engine)
+        print(" All tables dropped successfully!")
 
     print(" Creating tables...")
     create_db()
-    Base.metadata.create_all(bind=engine)
+    upgrade(engine)
     print(" All tables created successfully!")
 
     print(" Seeding data...")
-    seed_users()
-    seed_emotions()
-    seed_tips()
-    seed_breathing_exercises()
-    seed_diary_entries()
-    seed_writing_entries()
+    try:
+        seed_all(args.chunk_size)
+    finally:
+        shutdown_hasher()
     print(" All data seeded successfully!")
@@ -0,0 +1,144 @@
+"""A minimal in-process SMTP server for local development and tests.
+
+Accepts every message (except for ``rejected`` recipients, answered with
+550) and keeps it in memory. Run it standalone and point the API at it:
+
+    python -m scripts.fake_smtp --port 1025
+    SMTP_HOST=127.0.0.1 SMTP_PORT=1025 SMTP_STARTTLS=0 uvicorn app.main:app
+
+or start it from Python and hand its ``connect`` to ``app.mailer.SMTPPool``.
+"""
+import argparse
+import smtplib
+import socketserver
+import threading
+from email import message_from_bytes
+from email.message import Message
+from typing import Callable, Iterable, List, NamedTuple, Optional
+
+
+class ReceivedMessage(NamedTuple):
+    mail_from: str
+    recipients: List[str]
+    message: Message
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line: str):
+        self.wfile.write(line.encode("ascii") + b"\r\n")
+
+    def handle(self):
+        server = self.server.fake
+        server.connections += 1
+        self.reply("220 fake-smtp ready")
+        mail_from, recipients = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command, _, argument = line.decode("utf-8", "replace").strip().partition(" ")
+            command = command.upper()
+            if command == "EHLO":
+                self.reply("250-fake-smtp")
+                self.reply("250 8BITMIME")
+            elif command == "HELO":
+                self.reply("250 fake-smtp")
+            elif command == "MAIL":
+                mail_from, recipients = _address(argument), []
+                self.reply("250 OK")
+            elif command == "RCPT":
+                recipient = _address(argument)
+                if recipient in server.rejected:
+                    self.reply("550 No such user")
+                else:
+                    recipients.append(recipient)
+                    self.reply("250 OK")
+            elif command == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                for data in iter(self.rfile.readline, b""):
+                    if data in (b".\r\n", b".\n"):
+                        break
+                    lines.append(data[1:] if data.startswith(b"..") else data)
+                received = ReceivedMessage(mail_from, recipients, message_from_bytes(b"".join(lines)))
+                server.messages.append(received)
+                if server.on_message:
+                    server.on_message(received)
+                self.reply("250 OK queued")
+            elif command in ("RSET", "NOOP"):
+                if command == "RSET":
+                    mail_from, recipients = None, []
+                self.reply("250 OK")
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+def _address(argument: str) -> str:
+    _, _, address = argument.partition(":")
+    return address.strip().split(" ")[0].strip("<>")
+
+
+class _ThreadingServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class FakeSMTPServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, rejected: Iterable[str] = (),
+                 on_message: Optional[Callable[[ReceivedMessage], None]] = None):
+        self.host = host
+        self.port = port
+        self.rejected = set(rejected)
+        self.on_message = on_message
+        self.messages: List[ReceivedMessage] = []
+        self.connections = 0
+        self._server = None
+        self._thread = None
+
+    def start(self) -> "FakeSMTPServer":
+        self._server = _ThreadingServer((self.host, self.port), _SMTPHandler)
+        self._server.fake = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def connect(self) -> smtplib.SMTP:
+        """Connection factory for ``app.mailer.SMTPPool``."""
+        return smtplib.SMTP(self.host, self.port, timeout=5)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def _print_message(received: ReceivedMessage):
+    message = received.message
+    print(f" From {received.mail_from} to {', '.join(received.recipients)}: {message['Subject']}")
+    print(f"     {message.get_payload(decode=True).decode('utf-8', 'replace').strip()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1025)
+    parser.add_argument("--reject", action="append", default=[], help="answer 550 for this recipient")
+    args = parser.parse_args()
+
+    server = FakeSMTPServer(args.host, args.port, args.reject, on_message=_print_message).start()
+    print(f" Fake SMTP server listening on {server.host}:{server.port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
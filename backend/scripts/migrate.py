@@ -0,0 +1,23 @@
+import argparse
+
+from app.database import engine
+from app.migrations import MIGRATIONS, applied_versions, upgrade
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply pending schema migrations.")
+    parser.add_argument("--status", action="store_true", help="list migrations without applying them")
+    args = parser.parse_args()
+
+    if args.status:
+        applied = applied_versions(engine)
+        for m in MIGRATIONS:
+            print(f" [{'x' if m.version in applied else ' '}] {m.version}: {m.description}")
+        return
+
+    if not upgrade(engine):
+        print(" Schema is up to date.")
+
+
+if __name__ == "__main__":
+    main()
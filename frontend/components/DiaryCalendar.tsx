@@ -96,8 +96,15 @@ const DiaryCalendar: React.FC<DiaryCalendarProps> = ({ onSelectDate }) => {
           return;
         }
 
-        const response = await axios.get(`${API_BASE_URL}/api/diary/${user_id}`);
-        const entriesData = response.data.entries;
+        const entriesData: DiaryEntry[] = [];
+        let cursor: string | null = null;
+        do {
+          const response = await axios.get(`${API_BASE_URL}/api/diary/${user_id}`, {
+            params: { limit: 500, ...(cursor ? { cursor } : {}) },
+          });
+          entriesData.push(...response.data.entries);
+          cursor = response.data.next_cursor;
+        } while (cursor);
 
         setEntries(entriesData);
         prepareMarkedDates(entriesData);
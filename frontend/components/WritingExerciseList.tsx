@@ -27,9 +27,17 @@ const WritingExerciseList: React.FC = () => {
                     return;
                 }
 
-                const response = await axios.get(`${API_BASE_URL}/api/diary/write_exercises/${user_id}`);
-                setEntries(response.data);
-                setVisibleEntries(response.data.slice(0, 3));
+                const allEntries: WritingExerciseEntry[] = [];
+                let cursor: string | undefined;
+                do {
+                    const response = await axios.get(`${API_BASE_URL}/api/diary/write_exercises/${user_id}`, {
+                        params: { limit: 500, ...(cursor ? { cursor } : {}) },
+                    });
+                    allEntries.push(...response.data);
+                    cursor = response.headers["x-next-cursor"];
+                } while (cursor);
+                setEntries(allEntries);
+                setVisibleEntries(allEntries.slice(0, 3));
             } catch (error) {
                 console.error("Error fetching writing exercises:", error);
                 Alert.alert("Error", "Could not load your notes.");